@@ -0,0 +1,97 @@
+"""
+This module stores job activities on disk in a columnar format that worker
+processes memory-map, so that they all share one copy of the activities in
+the page cache instead of each holding its own list of activity objects.
+
+Each refresh writes a new generation of the store into its own directory and
+then publishes it by atomically replacing the `CURRENT` file, which names the
+current generation. Readers that already have an older generation open keep
+using it until they notice the new one.
+"""
+
+from typing import Optional
+import logging
+import os
+import shutil
+import numpy as np
+from job_nimbus.activity_columns import ActivityColumns
+import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ACTIVITY_STORE_DIR = "jn_job_activities.columnar"
+CURRENT_FILENAME = "CURRENT"
+ARRAY_NAMES = ["jnid_indices", "timestamps", "record_types", "old_status_ids", "new_status_ids"]
+
+def write_activity_store(columns: ActivityColumns, store_dir: str = ACTIVITY_STORE_DIR) -> str:
+    """Write the columns as a new generation of the store and publish it.
+
+    Returns: The name of the new generation."""
+    os.makedirs(store_dir, exist_ok=True)
+    previous = _read_current(store_dir)
+    generation = f"gen-{int(previous[len('gen-'):]) + 1 if previous else 1:06d}"
+    generation_dir = os.path.join(store_dir, generation)
+    os.makedirs(generation_dir, exist_ok=True)
+
+    with metrics.span("activity_store.write"):
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(generation_dir, f"{name}.npy"), getattr(columns, name))
+        # the string table: the utf-8 encoded jnids back to back, and the
+        # offset of each one
+        encoded = [jnid.encode('utf-8') for jnid in columns.jnids]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        np.save(os.path.join(generation_dir, "jnid_offsets.npy"), offsets)
+        with open(os.path.join(generation_dir, "jnids.bin"), 'wb') as f:
+            f.write(b''.join(encoded))
+
+    # publish the new generation
+    current_path = os.path.join(store_dir, CURRENT_FILENAME)
+    with open(f"{current_path}.tmp", 'w', encoding='utf-8') as f:
+        f.write(generation)
+    os.replace(f"{current_path}.tmp", current_path)
+    logger.info(f"Published {generation} of {store_dir} with {len(columns)} activities")
+
+    # remove generations older than the previous one, which readers may still
+    # have open
+    for name in os.listdir(store_dir):
+        if name.startswith("gen-") and name not in (generation, previous):
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+    return generation
+
+def _read_current(store_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILENAME), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# the generation that is open in this process
+_open_generation: Optional[tuple[str, str, ActivityColumns]] = None
+
+def open_activity_store(store_dir: str = ACTIVITY_STORE_DIR) -> Optional[ActivityColumns]:
+    """Memory-map the current generation of the store, or return None if
+    there is no store yet. The mapping is reused until a new generation is
+    published."""
+    global _open_generation
+    generation = _read_current(store_dir)
+    if generation is None:
+        return None
+    if _open_generation is not None and _open_generation[:2] == (store_dir, generation):
+        return _open_generation[2]
+
+    generation_dir = os.path.join(store_dir, generation)
+    with metrics.span("activity_store.open"):
+        arrays = {name: np.load(os.path.join(generation_dir, f"{name}.npy"), mmap_mode='r') for name in ARRAY_NAMES}
+        offsets = np.load(os.path.join(generation_dir, "jnid_offsets.npy")).tolist()
+        with open(os.path.join(generation_dir, "jnids.bin"), 'rb') as f:
+            table = f.read()
+        jnids = [table[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+    columns = ActivityColumns(jnids=jnids, **arrays)
+    _open_generation = (store_dir, generation, columns)
+    logger.info(f"Opened {generation} of {store_dir} with {len(columns)} activities")
+    return columns
+
+def current_generation(store_dir: str = ACTIVITY_STORE_DIR) -> Optional[str]:
+    return _read_current(store_dir)
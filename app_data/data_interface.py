@@ -3,6 +3,11 @@ This module provides a data interface for storing and retrieving data from a
 file.
 
 The data is stored in a JSON file, and the data is serialized using jsonpickle.
+
+The file can be shared by several processes (e.g. the workers of a WSGI
+server). Writes replace the file atomically under a file lock and bump a
+version counter stored next to it, readers reload the file only when that
+counter has changed, and only one process at a time runs the refresher.
 """
 
 from dataclasses import dataclass
@@ -10,45 +15,118 @@ import os
 from typing import Callable, Optional, TypeVar, Generic
 import jsonpickle
 import logging
+import time
 from datetime import datetime
+from .file_lock import FileLock
+import metrics
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# how often (in seconds) to check whether another process has changed the data
+RELOAD_CHECK_INTERVAL = 1.0
+
 T = TypeVar('T')
 class DataInterface(Generic[T]):
-    def __init__(self, filepath: str, fixer: Callable[[T], T] = lambda x: x):
+    def __init__(self, filepath: str, fixer: Callable[[T], T] = lambda x: x, lazy: bool = False):
+        """If `lazy` is set, the file isn't loaded until the value is first
+        accessed."""
         self.filepath = filepath
+        self.fixer = fixer
         self.refresher = None
+        # incremented (across all processes) every time the value changes, so
+        # that derived data can be cached per version
+        self.version = 0
+        self._cache = None
+        self.last_updated = None
+        self._version_filepath = f"{filepath}.version"
+        # held while reading or writing the file
+        self._file_lock = FileLock(f"{filepath}.lock")
+        # held while refreshing, so that only one process refreshes at a time
+        self._refresh_lock = FileLock(f"{filepath}.refresh.lock")
+        self._last_version_check = time.monotonic()
+        self._loaded = False
+        if lazy:
+            self._load_metadata()
+        else:
+            self._load()
 
+    def _read_version(self) -> int:
+        try:
+            with open(self._version_filepath, 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _load_metadata(self):
+        self.version = self._read_version()
         if os.path.exists(self.filepath):
-            logger.info(f"Loading from {self.filepath}")
             self.last_updated = datetime.fromtimestamp(os.path.getmtime(self.filepath))
-            with open(self.filepath, 'r', encoding='utf-8') as f:
-                self._cache = fixer(jsonpickle.decode(f.read(), keys=True))
+
+    def _load(self):
+        self._loaded = True
+        with self._file_lock.shared():
+            self.version = self._read_version()
+            if os.path.exists(self.filepath):
+                logger.info(f"Loading from {self.filepath}")
+                self.last_updated = datetime.fromtimestamp(os.path.getmtime(self.filepath))
+                with metrics.span(f"data_interface.load {self.filepath}"), open(self.filepath, 'r', encoding='utf-8') as f:
+                    self._cache = self.fixer(jsonpickle.decode(f.read(), keys=True))
+            else:
+                logger.info(f"Missing data for {self.filepath}")
+                self._cache = None
+                self.last_updated = None
+
+    def reload_if_changed(self) -> bool:
+        """Reload the data if another process has changed it since it was last
+        loaded. This only looks at the file every `RELOAD_CHECK_INTERVAL`
+        seconds.
+
+        Returns: Whether the data was reloaded."""
+        now = time.monotonic()
+        if now - self._last_version_check < RELOAD_CHECK_INTERVAL:
+            return False
+        self._last_version_check = now
+        if self._read_version() == self.version:
+            return False
+        logger.info(f"{self.filepath} was changed by another process")
+        if self._loaded:
+            self._load()
         else:
-            logger.info(f"Missing data for {self.filepath}")
-            self._cache = None
-            self.last_updated = None
+            self._load_metadata()
+        return True
 
     def write_back(self):
         if self._cache is None:
             logger.warning(f"No data to save for {self.filepath}")
             return
         logger.info(f"Saving {self.filepath}")
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            f.write(jsonpickle.encode(self._cache, indent=2, keys=True))
+        with metrics.span(f"data_interface.write_back {self.filepath}"), self._file_lock.exclusive():
+            # write to a temporary file first so that readers never see a
+            # partially written file
+            with open(f"{self.filepath}.tmp", 'w', encoding='utf-8') as f:
+                f.write(jsonpickle.encode(self._cache, indent=2, keys=True))
+            os.replace(f"{self.filepath}.tmp", self.filepath)
+
+            self.version = self._read_version() + 1
+            with open(f"{self._version_filepath}.tmp", 'w', encoding='utf-8') as f:
+                f.write(str(self.version))
+            os.replace(f"{self._version_filepath}.tmp", self._version_filepath)
         self.last_updated = datetime.now()
 
     @property
     def val(self) -> Optional[T]:
+        if not self._loaded:
+            self._load()
+        self.reload_if_changed()
         if self._cache is None and self.refresher is not None:
-            self.val = self.refresher()
+            self.refresh()
         return self._cache
 
     @val.setter
     def val(self, val: T):
-        logger.debug(f"Setting val for {self.filepath}: {val}")
+        logger.debug(f"Setting val for {self.filepath}")
+        self._loaded = True
         self._cache = val
         self.write_back()
 
@@ -62,5 +140,17 @@ class DataInterface(Generic[T]):
         if self.refresher is None:
             logger.warning(f"No refresher set for {self.filepath}")
             return
-        logger.debug(f"Refreshing {self.filepath}")
-        self.val = self.refresher()
+        # the version on disk rather than the one last loaded here, so that
+        # only a refresh that finished while waiting for the lock is skipped
+        version_before = self._read_version()
+        with self._refresh_lock.exclusive():
+            if self._read_version() != version_before:
+                # another process refreshed the data while we were waiting
+                logger.info(f"{self.filepath} was refreshed by another process")
+                if self._loaded:
+                    self._load()
+                else:
+                    self._load_metadata()
+                return
+            logger.debug(f"Refreshing {self.filepath}")
+            self.val = self.refresher()
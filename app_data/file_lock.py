@@ -0,0 +1,55 @@
+"""
+This module provides advisory file locks, so that several processes (e.g.
+the workers of a WSGI server) can share the data files safely.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    """
+    A lock on a file that is shared between processes. Shared (reader) locks
+    are only supported on POSIX; on Windows, every lock is exclusive.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _locked(self, shared: bool) -> Iterator[None]:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                # msvcrt only retries for a few seconds before giving up
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def shared(self):
+        return self._locked(shared=True)
+
+    def exclusive(self):
+        return self._locked(shared=False)
@@ -1,16 +1,55 @@
 from datetime import datetime
+import os
+import jsonpickle
 from .data_interface import DataInterface
+from .snapshot_history import SnapshotHistoryStore
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from job_nimbus import JnActivity, JobLeadSource, JobStatus, JobParsedBaseData
+    from job_nimbus import JnActivity, JobLeadSource, JobStatus, JobParsedBaseData, Diagnostics
 
 jn_api_key = DataInterface[str]("jn_api_key.json")
 jn_job_statuses = DataInterface[dict[int, 'JobStatus']]("jn_job_statuses.json")
 jn_lead_sources = DataInterface[dict[int, 'JobLeadSource']]("jn_lead_sources.json")
 jn_job_jnids = DataInterface[list[str]]("jn_job_jnids.json")
 jn_job_base_data = DataInterface[dict[str, 'JobParsedBaseData']]("jn_job_base_data.json")
-jn_job_activities = DataInterface[list['JnActivity']]("jn_job_activities.json")
+# one file per refresh, so that recording a refresh doesn't rewrite the whole
+# history and nothing is loaded until the history is used
+jn_job_base_data_history = SnapshotHistoryStore("jn_job_base_data_history")
+# where the history used to be kept as a single SnapshotHistory
+LEGACY_JOB_BASE_DATA_HISTORY_FILEPATH = "jn_job_base_data_history.json"
+# workers read the activities from the columnar activity store instead, so
+# this is only loaded when it is actually used
+jn_job_activities = DataInterface[list['JnActivity']]("jn_job_activities.json", lazy=True)
+jn_job_activities_diagnostics = DataInterface['Diagnostics']("jn_job_activities_diagnostics.json")
 kpi_graph_settings = DataInterface[str]("kpi_graph_settings.json")
+# the number of days a job may sit in a status group before it counts as stuck,
+# by status group nickname
+kpi_stale_thresholds = DataInterface[dict[str, float]]("kpi_stale_thresholds.json")
 # jn_job_status_histories = DataInterface[dict[str, list[tuple[datetime, 'JobStatus']]]]("jn_job_status_histories.json")
+
+def _migrate_job_base_data_history():
+    if not os.path.exists(LEGACY_JOB_BASE_DATA_HISTORY_FILEPATH) or jn_job_base_data_history.num_revisions():
+        return
+    with open(LEGACY_JOB_BASE_DATA_HISTORY_FILEPATH, 'r', encoding='utf-8') as f:
+        history = jsonpickle.decode(f.read(), keys=True)
+    for revision in history.revisions:
+        jn_job_base_data_history.append(revision)
+    os.remove(LEGACY_JOB_BASE_DATA_HISTORY_FILEPATH)
+
+def record_job_base_data_snapshot(base_data: dict[str, 'JobParsedBaseData'], timestamp: datetime = None):
+    """Add a refresh of the job base data to its history."""
+    _migrate_job_base_data_history()
+    jn_job_base_data_history.record(base_data, timestamp)
+
+def job_base_data_as_of(timestamp: datetime) -> dict[str, 'JobParsedBaseData'] | None:
+    """Rebuild the job base data as it was at `timestamp`."""
+    _migrate_job_base_data_history()
+    return jn_job_base_data_history.as_of(timestamp)
+
+def data_version() -> tuple[int, int, int]:
+    """The combined version of the job data that KPIs are computed from."""
+    for data_interface in [jn_job_statuses, jn_job_base_data, jn_job_activities]:
+        data_interface.reload_if_changed()
+    return (jn_job_statuses.version, jn_job_base_data.version, jn_job_activities.version)
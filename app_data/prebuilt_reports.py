@@ -0,0 +1,120 @@
+"""
+This module reads and writes precomputed KPI reports: plotly figures (as JSON
+and HTML) and summary tables (as CSV), along with a manifest recording which
+graph settings and which version of the data they were built from.
+
+Reports are built ahead of time by the command line tool, and the dashboard
+uses them instead of recomputing the figures when they are up to date.
+"""
+
+from datetime import datetime
+from typing import Any, Optional
+import csv
+import json
+import logging
+import os
+from . import global_data as gd
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+REPORTS_DIR = os.environ.get("AHITOOL_REPORTS_DIR", "reports")
+MANIFEST_FILENAME = "manifest.json"
+
+def data_last_updated() -> dict[str, Optional[str]]:
+    """When each dataset that reports are built from was last updated."""
+    return {
+        data_interface.filepath: data_interface.last_updated.isoformat() if data_interface.last_updated else None
+        for data_interface in [gd.jn_job_statuses, gd.jn_job_base_data, gd.jn_job_activities]
+    }
+
+class ReportWriter:
+    """Writes the files of one run of the report builder, then the manifest."""
+
+    def __init__(self, reports_dir: str = REPORTS_DIR):
+        self.reports_dir = reports_dir
+        os.makedirs(reports_dir, exist_ok=True)
+        self.manifest = {
+            "generated_at": datetime.now().isoformat(),
+            "data_last_updated": data_last_updated(),
+            "presets": {},
+            "tables": {},
+        }
+
+    def add_preset(self, name: str, graph_settings: str, remove_cycles: bool):
+        self.manifest["presets"][name] = {
+            "graph_settings": graph_settings,
+            "remove_cycles": remove_cycles,
+            "figures": {},
+            "tables": {},
+        }
+
+    def write_figure(self, preset: str, kind: str, fig):
+        """Write a plotly figure as JSON (for the dashboard) and HTML (for
+        people)."""
+        filename = f"{preset}.{kind}"
+        fig.write_json(os.path.join(self.reports_dir, f"{filename}.json"))
+        fig.write_html(os.path.join(self.reports_dir, f"{filename}.html"), include_plotlyjs="cdn")
+        self.manifest["presets"][preset]["figures"][kind] = f"{filename}.json"
+        logger.info(f"Wrote {kind} figure for preset {preset}")
+
+    def write_table(self, preset: Optional[str], kind: str, rows: list[dict[str, Any]]):
+        filename = f"{preset}.{kind}.csv" if preset is not None else f"{kind}.csv"
+        with open(os.path.join(self.reports_dir, filename), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+        if preset is not None:
+            self.manifest["presets"][preset]["tables"][kind] = filename
+        else:
+            self.manifest["tables"][kind] = filename
+        logger.info(f"Wrote {filename}")
+
+    def finish(self):
+        # write the manifest last and atomically, so that readers never see a
+        # manifest that refers to files that haven't been written yet
+        path = os.path.join(self.reports_dir, MANIFEST_FILENAME)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"Wrote {path}")
+
+# the parsed manifest and figures, keyed by path and cached by modification
+# time
+_file_cache: dict[str, tuple[float, Any]] = {}
+
+def _load_json(path: str) -> Any:
+    mtime = os.path.getmtime(path)
+    if (cached := _file_cache.get(path)) is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        value = json.load(f)
+    _file_cache[path] = (mtime, value)
+    return value
+
+def find_prebuilt_figure(graph_settings: str, kind: str, remove_cycles: bool = False, reports_dir: str = REPORTS_DIR) -> Optional[dict[str, Any]]:
+    """
+    Find a prebuilt figure of the given kind for the graph settings, as a
+    plotly figure dict. Returns None if there is no such figure, or if it was
+    built from older data than what is currently loaded.
+    """
+    manifest_path = os.path.join(reports_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        manifest = _load_json(manifest_path)
+        current = data_last_updated()
+        for filepath, last_updated in current.items():
+            built_from = manifest["data_last_updated"].get(filepath)
+            if last_updated is None or built_from is None \
+                    or datetime.fromisoformat(built_from) < datetime.fromisoformat(last_updated):
+                return None
+        for preset in manifest["presets"].values():
+            if preset["graph_settings"].strip() == graph_settings.strip() \
+                    and preset["remove_cycles"] == remove_cycles \
+                    and kind in preset["figures"]:
+                logger.info(f"Using prebuilt {kind} figure from {reports_dir}")
+                return _load_json(os.path.join(reports_dir, preset["figures"][kind]))
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Unable to read prebuilt reports in {reports_dir}: {e}")
+    return None
@@ -0,0 +1,190 @@
+"""
+This module provides a versioned history of a keyed collection of records
+(e.g. job base data), so that the collection can be rebuilt as of any point in
+time.
+
+Each refresh is stored as the per-record field changes since the previous
+refresh, with a full checkpoint every few refreshes, so that storage grows
+with the number of changes rather than with the number of refreshes times the
+number of records.
+
+`SnapshotHistoryStore` keeps a history on disk with each revision in its own
+file, so that recording a refresh only appends one file, and rebuilding the
+records only reads the revisions since the nearest checkpoint.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime
+from typing import Any, Optional
+import jsonpickle
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# how many revisions to store as deltas before storing another full checkpoint
+CHECKPOINT_INTERVAL = 20
+
+@dataclass
+class SnapshotRevision:
+    timestamp: datetime
+    # the full set of records if this is a checkpoint, otherwise None
+    checkpoint: Optional[dict[str, Any]] = None
+    # records that were added since the previous revision
+    added: dict[str, Any] = field(default_factory=dict)
+    # for each record that changed since the previous revision, the new values
+    # of the fields that changed
+    changed: dict[str, dict[str, Any]] = field(default_factory=dict)
+    # keys of records that were removed since the previous revision
+    removed: list[str] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return self.checkpoint is None and not self.added and not self.changed and not self.removed
+
+class SnapshotHistory:
+    """The history of a `dict[str, <dataclass>]` as checkpoints and deltas."""
+
+    def __init__(self, checkpoint_interval: int = CHECKPOINT_INTERVAL):
+        self.checkpoint_interval = checkpoint_interval
+        self.revisions: list[SnapshotRevision] = []
+
+    def record(self, records: dict[str, Any], timestamp: Optional[datetime] = None) -> bool:
+        """
+        Record the state of the records at `timestamp` (defaults to now).
+
+        Returns: Whether a revision was added; nothing is added if there were
+        no changes since the previous revision.
+        """
+        timestamp = timestamp or datetime.now()
+        if self.revisions and timestamp < self.revisions[-1].timestamp:
+            raise ValueError(f"Revision at {timestamp} is older than the latest revision at {self.revisions[-1].timestamp}")
+
+        if not self.revisions:
+            revision = SnapshotRevision(timestamp, checkpoint=dict(records))
+        else:
+            revision = SnapshotRevision(timestamp)
+            previous = self.latest()
+            for key, record in records.items():
+                if key not in previous:
+                    revision.added[key] = record
+                elif (changes := diff_fields(previous[key], record)):
+                    revision.changed[key] = changes
+            revision.removed = [key for key in previous if key not in records]
+            if revision.is_empty():
+                return False
+            if self._revisions_since_checkpoint() + 1 >= self.checkpoint_interval:
+                revision = SnapshotRevision(timestamp, checkpoint=dict(records))
+
+        self.revisions.append(revision)
+        logger.info(f"Recorded {'checkpoint' if revision.checkpoint is not None else 'delta'} revision at {timestamp}")
+        return True
+
+    def latest(self) -> dict[str, Any]:
+        if not self.revisions:
+            return {}
+        return self._rebuild(len(self.revisions) - 1)
+
+    def as_of(self, timestamp: datetime) -> Optional[dict[str, Any]]:
+        """Rebuild the records as they were at `timestamp`, or None if there
+        were no revisions yet at that time."""
+        index = bisect_right([r.timestamp for r in self.revisions], timestamp) - 1
+        if index < 0:
+            return None
+        return self._rebuild(index)
+
+    def _revisions_since_checkpoint(self) -> int:
+        for i in range(len(self.revisions) - 1, -1, -1):
+            if self.revisions[i].checkpoint is not None:
+                return len(self.revisions) - 1 - i
+        return len(self.revisions)
+
+    def _rebuild(self, index: int) -> dict[str, Any]:
+        # find the nearest checkpoint at or before the revision
+        start = index
+        while self.revisions[start].checkpoint is None:
+            start -= 1
+        records = dict(self.revisions[start].checkpoint)
+
+        # apply the deltas after it
+        for revision in self.revisions[start + 1:index + 1]:
+            records.update(revision.added)
+            for key, changes in revision.changed.items():
+                records[key] = replace(records[key], **changes)
+            for key in revision.removed:
+                records.pop(key, None)
+        return records
+
+class SnapshotHistoryStore:
+    """A `SnapshotHistory` on disk, as one file per revision in `directory`.
+    Files are only ever added, each one atomically, and their names hold the
+    revision's index, timestamp and whether it is a checkpoint, so that the
+    files that are needed can be found without reading any of them."""
+
+    def __init__(self, directory: str, checkpoint_interval: int = CHECKPOINT_INTERVAL):
+        self.directory = directory
+        self.checkpoint_interval = checkpoint_interval
+
+    def _revision_files(self) -> list[tuple[datetime, bool, str]]:
+        """The (timestamp, is checkpoint, filename) of every revision, in
+        order."""
+        if not os.path.isdir(self.directory):
+            return []
+        revision_files = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            _, timestamp, kind = filename[:-len(".json")].split("_")
+            revision_files.append((datetime.strptime(timestamp, "%Y%m%dT%H%M%S%f"), kind == "checkpoint", filename))
+        return revision_files
+
+    def _load_history(self, revision_files: list[tuple[datetime, bool, str]], index: int) -> SnapshotHistory:
+        """Load the revisions from the nearest checkpoint at or before the
+        revision at `index` up to that revision."""
+        start = index
+        while start > 0 and not revision_files[start][1]:
+            start -= 1
+        history = SnapshotHistory(self.checkpoint_interval)
+        for _, _, filename in revision_files[start:index + 1]:
+            with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                history.revisions.append(jsonpickle.decode(f.read(), keys=True))
+        return history
+
+    def num_revisions(self) -> int:
+        return len(self._revision_files())
+
+    def append(self, revision: SnapshotRevision):
+        index = self.num_revisions()
+        kind = "checkpoint" if revision.checkpoint is not None else "delta"
+        path = os.path.join(self.directory, f"{index:06d}_{revision.timestamp:%Y%m%dT%H%M%S%f}_{kind}.json")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(jsonpickle.encode(revision, keys=True))
+        os.replace(f"{path}.tmp", path)
+
+    def record(self, records: dict[str, Any], timestamp: Optional[datetime] = None) -> bool:
+        """The same as `SnapshotHistory.record`, appending the new revision to
+        the store."""
+        revision_files = self._revision_files()
+        history = self._load_history(revision_files, len(revision_files) - 1) if revision_files else SnapshotHistory(self.checkpoint_interval)
+        if not history.record(records, timestamp):
+            return False
+        self.append(history.revisions[-1])
+        return True
+
+    def as_of(self, timestamp: datetime) -> Optional[dict[str, Any]]:
+        """The same as `SnapshotHistory.as_of`."""
+        revision_files = self._revision_files()
+        index = bisect_right([t for t, _, _ in revision_files], timestamp) - 1
+        if index < 0:
+            return None
+        return self._load_history(revision_files, index).latest()
+
+def diff_fields(old: Any, new: Any) -> dict[str, Any]:
+    """The fields of the dataclass `new` whose values differ from `old`."""
+    return {
+        f.name: getattr(new, f.name)
+        for f in fields(new)
+        if getattr(old, f.name) != getattr(new, f.name)
+    }
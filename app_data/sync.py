@@ -0,0 +1,50 @@
+"""
+This module connects the global data to the JobNimbus API, so that it can be
+synced from both the Dash app and the command line.
+"""
+
+import job_nimbus as jn
+from . import global_data as gd
+from .activity_store import write_activity_store
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# the API key that the session was initialized with
+_session_api_key = None
+
+def ensure_session():
+    """Initialize the API session, again if the API key has been changed
+    (possibly by another process)."""
+    global _session_api_key
+    api_key = gd.jn_api_key.val
+    if _session_api_key is None or api_key != _session_api_key:
+        jn.api.initialize_session(api_key)
+        _session_api_key = api_key
+
+def initialize_data():
+    ensure_session()
+    def refresh_job_statuses():
+        ensure_session()
+        return jn.api.request_job_statuses()
+    gd.jn_job_statuses.set_refresher(refresh_job_statuses)
+    def refresh_job_base_data():
+        ensure_session()
+        base_data = jn.api.request_all_job_base_data(gd.jn_job_statuses.val)
+        gd.record_job_base_data_snapshot(base_data)
+        return base_data
+    gd.jn_job_base_data.set_refresher(refresh_job_base_data)
+    def refresh_job_activities():
+        ensure_session()
+        activities, diagnostics = jn.api.request_all_parsed_job_activity()
+        gd.jn_job_activities_diagnostics.val = diagnostics
+        write_activity_store(jn.ActivityColumns.from_activities(activities))
+        return activities
+    gd.jn_job_activities.set_refresher(refresh_job_activities)
+
+def sync_all():
+    """Refresh the job statuses, base data and activities from JobNimbus."""
+    for data_interface in [gd.jn_job_statuses, gd.jn_job_base_data, gd.jn_job_activities]:
+        logger.info(f"Syncing {data_interface.filepath}")
+        data_interface.refresh()
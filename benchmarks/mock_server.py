@@ -0,0 +1,205 @@
+"""
+A local stand-in for the JobNimbus API, serving synthetic data, so that the
+sync code can be benchmarked and regression-tested offline.
+
+Usage:
+    python -m benchmarks.mock_server --jobs 10000 --port 8765 --latency-ms 50 --error-rate 0.05
+    JOBNIMBUS_BASE_URL=http://127.0.0.1:8765 python dash_app_main.py
+
+Implements `GET jobs`, `GET activities` (with `filter`, `from`, `size` and
+`fields`), `GET account/settings` and `PUT jobs/<jnid>`. Latency, a cap on
+the page size, 429 responses and dropped connections can be injected.
+"""
+
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from .synthetic_data import generate_account_settings, generate_jobs_and_activities
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class MockServerConfig:
+    # seconds added to every response
+    latency: float = 0
+    # the most results returned by one request, regardless of `size`
+    page_cap: int = 10000
+    # probability of responding to a request with 429 Too Many Requests
+    error_rate: float = 0
+    # probability of closing the connection without responding
+    drop_rate: float = 0
+    seed: int = 0
+
+class MockJobNimbus:
+    """The data behind the mock server."""
+
+    def __init__(self, num_jobs: int, config: MockServerConfig):
+        self.config = config
+        self.settings = generate_account_settings()
+        jobs, self.activities = generate_jobs_and_activities(num_jobs, config.seed)
+        self.jobs = {job["jnid"]: job for job in jobs}
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.num_requests = 0
+
+def get_path(record: dict[str, Any], path: str) -> Any:
+    for key in path.split('.'):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+def matches_filter(record: dict[str, Any], filter_json: dict[str, Any]) -> bool:
+    """Evaluate the subset of the Elasticsearch-style filter language that the
+    JobNimbus API accepts and this app uses: `must` with `term` and `range`."""
+    for clause in filter_json.get("must", []):
+        if "term" in clause:
+            for path, value in clause["term"].items():
+                if get_path(record, path) != value:
+                    return False
+        elif "range" in clause:
+            for path, bounds in clause["range"].items():
+                value = get_path(record, path)
+                if value is None:
+                    return False
+                for op, bound in bounds.items():
+                    if op == "lte" and not value <= bound \
+                            or op == "lt" and not value < bound \
+                            or op == "gte" and not value >= bound \
+                            or op == "gt" and not value > bound:
+                        return False
+        else:
+            raise ValueError(f"Unsupported filter clause: {clause}")
+    return True
+
+def make_handler(data: MockJobNimbus) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def send_json(self, status: int, body: Any, headers: Optional[dict[str, str]] = None):
+            encoded = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def inject_faults(self) -> bool:
+            """Returns whether the request has been dealt with by a fault."""
+            with data.lock:
+                data.num_requests += 1
+                roll = data.rng.random()
+            if data.config.latency:
+                time.sleep(data.config.latency)
+            if roll < data.config.drop_rate:
+                self.close_connection = True
+                self.connection.close()
+                return True
+            if roll < data.config.drop_rate + data.config.error_rate:
+                self.send_json(429, {"error": "Too Many Requests"}, {"Retry-After": "1"})
+                return True
+            return False
+
+        def do_GET(self):
+            if self.inject_faults():
+                return
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            path = url.path.strip('/')
+            match path:
+                case "account/settings":
+                    self.send_json(200, data.settings)
+                case "jobs":
+                    self.send_page("results", list(data.jobs.values()), params)
+                case "activities":
+                    self.send_page("activity", data.activities, params)
+                case _ if path.startswith("jobs/") and path[len("jobs/"):] in data.jobs:
+                    self.send_json(200, data.jobs[path[len("jobs/"):]])
+                case _:
+                    self.send_json(404, {"error": f"Not found: {path}"})
+
+        def do_PUT(self):
+            # read the body before any fault, so that a kept-alive connection
+            # isn't left with it as the next request
+            raw_body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.inject_faults():
+                return
+            path = urlparse(self.path).path.strip('/')
+            body = json.loads(raw_body or b"{}")
+            jnid = path[len("jobs/"):] if path.startswith("jobs/") else None
+            if jnid not in data.jobs:
+                self.send_json(404, {"error": f"Not found: {path}"})
+                return
+            with data.lock:
+                data.jobs[jnid].update(body)
+                job = dict(data.jobs[jnid])
+            self.send_json(200, job)
+
+        def send_page(self, results_key: str, records: list[dict[str, Any]], params: dict[str, str]):
+            try:
+                filter_json = json.loads(params["filter"]) if "filter" in params else {}
+                start = int(params.get("from", 0))
+                size = min(int(params.get("size", 10)), data.config.page_cap)
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            if filter_json:
+                records = [r for r in records if matches_filter(r, filter_json)]
+            page = records[start:start + size]
+            if "fields" in params:
+                fields = params["fields"].split(',')
+                page = [{field: r[field] for field in fields if field in r} for r in page]
+            self.send_json(200, {"count": len(records), results_key: page})
+
+    return Handler
+
+def start_mock_server(num_jobs: int, config: Optional[MockServerConfig] = None, host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, MockJobNimbus]:
+    """Start the mock server in a background thread. Its base URL is
+    `f"http://{host}:{server.server_port}"`; call `server.shutdown()` to stop
+    it."""
+    data = MockJobNimbus(num_jobs, config if config is not None else MockServerConfig())
+    server = ThreadingHTTPServer((host, port), make_handler(data))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Mock JobNimbus server with {num_jobs} jobs listening on http://{host}:{server.server_port}")
+    return server, data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--page-cap", type=int, default=10000)
+    parser.add_argument("--error-rate", type=float, default=0, help="probability of a 429 response")
+    parser.add_argument("--drop-rate", type=float, default=0, help="probability of dropping the connection")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    config = MockServerConfig(
+        latency=args.latency_ms / 1000,
+        page_cap=args.page_cap,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+    server, _ = start_mock_server(args.jobs, config, args.host, args.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
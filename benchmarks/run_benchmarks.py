@@ -0,0 +1,138 @@
+"""
+Benchmark the fetch-parse-analyze pipeline on synthetic data.
+
+Usage:
+    python -m benchmarks.run_benchmarks --scale 10k 100k --output bench_results.json
+
+For each scale (number of jobs), this times and measures the peak memory of
+each stage of the pipeline, and writes the results as JSON so that they can be
+compared across versions.
+"""
+
+from datetime import datetime
+from typing import Any, Callable
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+def measure(stage: str, fn: Callable[[], Any], trace_memory: bool) -> tuple[dict[str, Any], Any]:
+    """Run `fn`, returning its timing and peak memory along with its result."""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak_bytes = None
+    if trace_memory:
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    logger.info(f"{stage}: {seconds:.3f}s" + (f", peak {peak_bytes / 2**20:.1f} MiB" if peak_bytes is not None else ""))
+    return {"stage": stage, "seconds": seconds, "peak_bytes": peak_bytes}, result
+
+def run_scale(num_jobs: int, seed: int, trace_memory: bool) -> list[dict[str, Any]]:
+    # imported here so that the data files are read from and written to the
+    # temporary working directory
+    import job_nimbus as jn
+    from job_nimbus.json_keys import KEY_JNID
+    from app_data import global_data as gd
+    from app_data.data_interface import DataInterface
+    from job_analysis.graph_embedding import JobGraphEmbedding
+    from .synthetic_data import generate_account_settings, generate_jobs_and_activities
+
+    results = []
+    def stage(name: str, fn: Callable[[], Any]) -> Any:
+        stage_result, value = measure(name, fn, trace_memory)
+        stage_result["num_jobs"] = num_jobs
+        results.append(stage_result)
+        return value
+
+    settings = generate_account_settings()
+    jobs_json, activities_json = stage("generate", lambda: generate_jobs_and_activities(num_jobs, seed))
+    logger.info(f"Generated {len(jobs_json)} jobs and {len(activities_json)} activities")
+    results[-1]["num_activities"] = len(activities_json)
+
+    statuses = {
+        status["id"]: jn.JobStatus(status["id"], status["name"])
+        for workflow in settings["workflows"] if workflow["object_type"] == "job"
+        for status in workflow["status"]
+    }
+    gd.jn_job_statuses.val = statuses
+
+    base_data = stage("parse_job_base_data", lambda: {
+        job_json[KEY_JNID]: jn.parse_job_base_data(job_json, statuses) for job_json in jobs_json
+    })
+    activities, _ = stage("parse_jn_activity", lambda: jn.parse_all_jn_activities(activities_json))
+    del jobs_json, activities_json
+
+    histories, _ = stage("construct_job_status_history", lambda: jn.construct_all_job_status_histories(activities, base_data))
+
+    # one status group per status, in workflow order
+    status_groups = [frozenset([status]) for status in statuses.values()]
+    def build_embedding():
+        embedding = JobGraphEmbedding(status_groups)
+        for jnid, history in histories.items():
+            embedding.add_status_history(history, jnid)
+        return embedding
+    embedding = stage("JobGraphEmbedding", build_embedding)
+    stage("to_sankey", embedding.to_sankey)
+
+    data_interface = DataInterface[list](f"bench_activities_{num_jobs}.json")
+    stage("DataInterface.save", lambda: setattr(data_interface, "val", activities))
+    stage("DataInterface.load", lambda: DataInterface[list](f"bench_activities_{num_jobs}.json"))
+    return results
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", nargs="+", choices=SCALES.keys(), default=["10k"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--no-memory", action="store_true", help="don't trace peak memory, which slows down every stage")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    output_path = os.path.abspath(args.output)
+
+    report = {
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": [],
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            for scale in args.scale:
+                logger.info(f"Running benchmarks at scale {scale}")
+                report["results"].extend(run_scale(SCALES[scale], args.seed, not args.no_memory))
+        finally:
+            os.chdir(cwd)
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote results to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Seeded generator of realistic JobNimbus JSON: the account settings, jobs and
+activities (job created, status changed and job modified), in the shapes
+returned by the JobNimbus API.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any
+import random
+from job_nimbus.json_keys import (
+    KEY_JNID, KEY_STATUS_ID, KEY_STATUS_NAME, KEY_STATUS_MOD_TIME, KEY_SALES_REP,
+    KEY_INSURANCE_CHECKBOX, KEY_INSURANCE_COMPANY_NAME, KEY_INSURANCE_CLAIM_NUMBER,
+    KEY_JOB_NUMBER, KEY_JOB_NAME, KEY_APPOINTMENT_DATE, KEY_CONTINGENCY_DATE,
+    KEY_CONTRACT_DATE, KEY_INSTALL_DATE, KEY_LOSS_DATE, KEY_AMOUNT_RECEIVABLE,
+)
+
+# the job workflow, in the order a job normally goes through it
+STATUS_NAMES = [
+    "Lead",
+    "Appointment Scheduled",
+    "Inspection Complete",
+    "Contingency Signed",
+    "Claim Filed",
+    "Adjuster Meeting",
+    "Supplement Requested",
+    "Contract Signed",
+    "Materials Ordered",
+    "Install Scheduled",
+    "Installed",
+    "Invoiced",
+    "Paid",
+    "Lost",
+]
+LOST_STATUS_ID = len(STATUS_NAMES) - 1
+SALES_REPS = ["Alice Adams", "Bob Brown", "Carol Chen", "Dan Diaz", "Erin Evans", "Frank Fox"]
+INSURANCE_COMPANIES = ["State Farm", "Allstate", "USAA", "Farmers", "Liberty Mutual"]
+MODIFIED_FIELDS = ["Sales Appt Date", "Claim #", "Insurance Company", "Description", "Roof Type"]
+
+def generate_account_settings() -> dict[str, Any]:
+    """The `account/settings` response, with one job workflow."""
+    return {
+        "workflows": [
+            {
+                "name": "Jobs",
+                "object_type": "job",
+                "status": [{"id": status_id, "name": name} for status_id, name in enumerate(STATUS_NAMES)],
+            },
+            {
+                "name": "Contacts",
+                "object_type": "contact",
+                "status": [{"id": 100, "name": "Customer"}],
+            },
+        ],
+        "sources": [
+            {"JobSourceId": str(i), "SourceName": name}
+            for i, name in enumerate(["Door Knocking", "Referral", "Website", "Storm Canvass"])
+        ],
+    }
+
+def generate_jobs_and_activities(num_jobs: int, seed: int = 0, end: datetime = datetime(2025, 1, 1)) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """
+    Generate the JSON for `num_jobs` jobs and all of their activities, which
+    are returned newest first like the JobNimbus API returns them.
+    """
+    rng = random.Random(seed)
+    start = end - timedelta(days=3 * 365)
+    span_seconds = int((end - start).total_seconds())
+    jobs = []
+    activities = []
+
+    def activity(jnid: str, job_number: str, timestamp: int, record_type_name: str, note: str, **primary) -> dict[str, Any]:
+        return {
+            "jnid": f"act{len(activities):09d}",
+            "date_created": timestamp,
+            "record_type_name": record_type_name,
+            "note": note,
+            "is_status_change": record_type_name == "Status Changed",
+            "primary": {"id": jnid, "type": "job", "number": job_number, **primary},
+        }
+
+    for i in range(num_jobs):
+        jnid = f"job{i:09d}"
+        job_number = str(1000 + i)
+        created = int(start.timestamp()) + rng.randrange(span_seconds)
+        now = created
+        activities.append(activity(jnid, job_number, now, "Job Created", "Job Created"))
+
+        # walk through the workflow, sometimes bouncing back (supplements and
+        # rework) and sometimes getting lost
+        status_id = 0
+        status_mod_time = created
+        dates = {}
+        final_index = rng.randrange(1, LOST_STATUS_ID)
+        while status_id < final_index:
+            now += rng.randrange(3600, 21 * 86400)
+            if now >= end.timestamp():
+                break
+            if status_id >= 4 and rng.random() < 0.1:
+                new_status_id = rng.randrange(2, status_id)
+            elif rng.random() < 0.05:
+                new_status_id = LOST_STATUS_ID
+            else:
+                new_status_id = status_id + 1
+            activities.append(activity(
+                jnid, job_number, now, "Status Changed",
+                f"Status changed from {STATUS_NAMES[status_id]} to {STATUS_NAMES[new_status_id]}",
+                old_status=status_id, new_status=new_status_id,
+            ))
+            status_id = new_status_id
+            status_mod_time = now
+            dates.setdefault(status_id, now)
+            if status_id == LOST_STATUS_ID:
+                break
+
+            if rng.random() < 0.3:
+                field = rng.choice(MODIFIED_FIELDS)
+                activities.append(activity(
+                    jnid, job_number, now + rng.randrange(60, 3600), "Job Modified",
+                    f"Job Updated\n{field}: old value {rng.randrange(100)} => new value {rng.randrange(100)}",
+                ))
+
+        is_insurance = rng.random() < 0.7
+        jobs.append({
+            KEY_JNID: jnid,
+            KEY_JOB_NUMBER: job_number,
+            KEY_JOB_NAME: f"Customer {i} - {rng.randrange(100, 9999)} Main St",
+            KEY_STATUS_ID: status_id,
+            KEY_STATUS_NAME: STATUS_NAMES[status_id],
+            KEY_STATUS_MOD_TIME: status_mod_time,
+            KEY_SALES_REP: rng.choice(SALES_REPS),
+            KEY_INSURANCE_CHECKBOX: is_insurance,
+            KEY_INSURANCE_COMPANY_NAME: rng.choice(INSURANCE_COMPANIES) if is_insurance else "",
+            KEY_INSURANCE_CLAIM_NUMBER: f"CLM-{rng.randrange(10**8):08d}" if is_insurance else "",
+            KEY_APPOINTMENT_DATE: dates.get(1, 0),
+            KEY_CONTINGENCY_DATE: dates.get(3, 0),
+            KEY_CONTRACT_DATE: dates.get(7, 0),
+            KEY_INSTALL_DATE: dates.get(10, 0),
+            KEY_LOSS_DATE: dates.get(LOST_STATUS_ID, 0),
+            KEY_AMOUNT_RECEIVABLE: round(rng.uniform(0, 30000), 2) if status_id in (10, 11) else 0,
+            "date_created": created,
+            "date_updated": status_mod_time,
+        })
+
+    activities.sort(key=lambda a: a["date_created"], reverse=True)
+    return jobs, activities
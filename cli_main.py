@@ -0,0 +1,119 @@
+# command line entry point for syncing data and prebuilding KPI reports
+# without the Dash GUI, e.g. from cron:
+#
+#     0 3 * * * cd /path/to/ahitool && python cli_main.py --presets presets.json
+#
+# For development, --response-cache record keeps the API responses on disk, and
+# --response-cache replay syncs from them again without network access.
+#
+# The presets file maps preset names to graph settings:
+#
+#     {"default": {"graph_settings": "Category A: Status 1, Status 2\n...", "remove_cycles": false}}
+#
+# Without a presets file, the graph settings last used on the KPI page are
+# built as the "default" preset.
+
+import argparse
+import json
+import logging
+import sys
+from collections import Counter
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+)
+
+import job_nimbus as jn
+from app_data import global_data as gd
+from app_data.prebuilt_reports import REPORTS_DIR, ReportWriter
+from app_data.sync import initialize_data, sync_all
+from job_nimbus.response_cache import MODES as RESPONSE_CACHE_MODES, response_cache_from_env
+from job_analysis import build_graph_embedding, compute_status_occupancy, parse_status_groups
+from job_analysis.figures import make_occupancy_figure, make_sankey_figure
+
+OCCUPANCY_DAYS = 365
+
+def load_presets(presets_path: str | None) -> dict[str, dict]:
+    if presets_path is not None:
+        with open(presets_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if gd.kpi_graph_settings.val:
+        return {"default": {"graph_settings": gd.kpi_graph_settings.val, "remove_cycles": False}}
+    return {}
+
+def build_reports(presets: dict[str, dict], reports_dir: str):
+    writer = ReportWriter(reports_dir)
+    job_status_histories, diagnostics = jn.construct_all_job_status_histories(gd.jn_job_activities.val, gd.jn_job_base_data.val)
+
+    # tables that don't depend on the graph settings
+    status_counts = Counter(job.status.name for job in gd.jn_job_base_data.val.values())
+    writer.write_table(None, "job_counts_by_status", [
+        {"status": name, "num_jobs": count} for name, count in status_counts.most_common()
+    ])
+    writer.write_table(None, "diagnostics", [
+        {"kind": row["kind"], "count": row["count"], "samples": "\n".join(row["samples"])}
+        for row in diagnostics.summary()
+    ])
+
+    end = date.today()
+    start = end - timedelta(days=OCCUPANCY_DAYS - 1)
+    for name, preset in presets.items():
+        logger.info(f"Building preset {name}")
+        graph_settings = preset["graph_settings"]
+        remove_cycles = preset.get("remove_cycles", False)
+        writer.add_preset(name, graph_settings, remove_cycles)
+        status_groups, status_group_nicknames = parse_status_groups(graph_settings, gd.jn_job_statuses.val)
+
+        graph_embedding, _ = build_graph_embedding(job_status_histories, status_groups, remove_cycles)
+        writer.write_figure(name, "sankey", make_sankey_figure(graph_embedding, status_group_nicknames))
+        labels = [*status_group_nicknames, "Job Created"]
+        source_indices, target_indices, values, avg_durations = graph_embedding.to_sankey()
+        writer.write_table(name, "links", [
+            {"source": labels[source], "target": labels[target], "num_jobs": value, "avg_duration_days": avg_duration}
+            for source, target, value, avg_duration in zip(source_indices, target_indices, values, avg_durations)
+        ])
+
+        days, occupancy = compute_status_occupancy(job_status_histories, status_groups, start, end)
+        writer.write_figure(name, "occupancy", make_occupancy_figure(days, occupancy, status_group_nicknames))
+    writer.finish()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync JobNimbus data and prebuild KPI reports.")
+    parser.add_argument("--no-sync", action="store_true", help="build reports from the data already on disk")
+    parser.add_argument("--no-reports", action="store_true", help="only sync the data")
+    parser.add_argument("--presets", help="JSON file of graph settings presets to build")
+    parser.add_argument("--output-dir", default=REPORTS_DIR)
+    parser.add_argument("--response-cache", choices=RESPONSE_CACHE_MODES, help="mode of the on-disk cache of API responses")
+    args = parser.parse_args()
+
+    if args.response_cache is not None:
+        response_cache = response_cache_from_env()
+        response_cache.mode = args.response_cache
+        jn.api.set_response_cache(response_cache)
+
+    if gd.jn_api_key.val is None and not args.no_sync:
+        logger.error("No JobNimbus API key saved; set one in the dashboard first")
+        return 1
+    # without syncing, no refreshers are set, so that missing data is reported
+    # below rather than fetched
+    if not args.no_sync:
+        initialize_data()
+        sync_all()
+    if not args.no_reports:
+        missing = [data.filepath for data in (gd.jn_job_statuses, gd.jn_job_base_data, gd.jn_job_activities) if data.val is None]
+        if missing:
+            logger.error(f"No data on disk to build reports from ({', '.join(missing)}); run without --no-sync first")
+            return 1
+        presets = load_presets(args.presets)
+        if not presets:
+            logger.warning("No graph settings presets to build")
+        build_reports(presets, args.output_dir)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
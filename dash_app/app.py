@@ -1,8 +1,11 @@
 from dash import Dash, html, callback, Output, Input, dcc
 import dash_bootstrap_components as dbc
 from .kpi_page import kpi_layout
-import job_nimbus as jn
-from app_data import global_data as gd
+from .metrics_page import metrics_layout, register_metrics_routes
+from .search_page import job_layout, search_layout
+from .jn_client import register_data_status_routes
+from .kpi_api import register_kpi_api_routes
+from app_data.sync import initialize_data
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +18,12 @@ app_layout = dbc.Container([
             dbc.NavItem(
                 dbc.NavLink("KPIs", href="/kpis", active="exact")
             ),
+            dbc.NavItem(
+                dbc.NavLink("Job Search", href="/search", active="exact")
+            ),
+            dbc.NavItem(
+                dbc.NavLink("Metrics", href="/metrics", active="exact")
+            ),
         ],
         brand="ahitool",
         brand_href="/",
@@ -46,6 +55,15 @@ def render_page_content(pathname):
         case "/kpis":
             logger.info("Loading KPI dashboard page")
             return kpi_layout
+        case "/metrics":
+            logger.info("Loading metrics page")
+            return metrics_layout
+        case "/search":
+            logger.info("Loading job search page")
+            return search_layout
+        case str() if pathname.startswith("/jobs/"):
+            logger.info("Loading job page")
+            return job_layout(pathname.removeprefix("/jobs/"))
         case "/":
             logger.info("Loading home page")
             return home_layout
@@ -53,15 +71,6 @@ def render_page_content(pathname):
             logger.warning(f"Page not found: {pathname}")
             return not_found_layout
 
-def initialize_data():
-    jn.api.initialize_session(gd.jn_api_key.val)
-    gd.jn_job_statuses.set_refresher(lambda: jn.api.request_job_statuses())
-    gd.jn_job_base_data.set_refresher(lambda: jn.api.request_all_job_base_data(gd.jn_job_statuses.val))
-    def refresh_job_activities():
-        job_activities = jn.api.request_all_job_activity()
-        return [jn.parse_jn_activity(a) for a in job_activities]
-    gd.jn_job_activities.set_refresher(refresh_job_activities)
-
 def create_app():
     app = Dash(
         __name__,
@@ -71,4 +80,7 @@ def create_app():
     app.layout = app_layout
     app.title = "AHI Tool"
     app._favicon = "favicon.ico"
+    register_metrics_routes(app.server)
+    register_data_status_routes(app.server)
+    register_kpi_api_routes(app.server)
     return app
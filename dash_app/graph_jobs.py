@@ -0,0 +1,126 @@
+"""
+This module runs slow graph computations as background jobs in a bounded
+thread pool, so that they don't tie up the server's request threads.
+
+The state of each job (its progress, result and whether it has been
+cancelled) is kept in files in a shared directory, so that any worker process
+can report on or cancel a job that another worker is running.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from uuid import uuid4
+import json
+import logging
+import os
+import time
+from plotly.utils import PlotlyJSONEncoder
+import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+JOBS_DIR = "graph_jobs"
+MAX_WORKERS = 2
+# how long to keep the files of finished jobs, in seconds
+JOB_RETENTION = 3600
+# how often a job writes its progress, in seconds
+PROGRESS_INTERVAL = 0.25
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="graph-job")
+
+class GraphJobCancelled(Exception):
+    pass
+
+def _path(job_id: str, suffix: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.{suffix}")
+
+def _write_json(path: str, value: Any):
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(value, f, cls=PlotlyJSONEncoder)
+    os.replace(f"{path}.tmp", path)
+
+def _write_status(job_id: str, state: str, phase: str, done: int = 0, total: int = 0, error: Optional[str] = None):
+    _write_json(_path(job_id, "status.json"), {
+        "state": state,
+        "phase": phase,
+        "done": done,
+        "total": total,
+        "error": error,
+    })
+
+class ProgressReporter:
+    """Called by a job with its progress; raises `GraphJobCancelled` if the
+    job has been cancelled so that the job stops."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._last_write = 0
+
+    def __call__(self, phase: str, done: int = 0, total: int = 0):
+        now = time.monotonic()
+        if now - self._last_write < PROGRESS_INTERVAL and done < total:
+            return
+        self._last_write = now
+        if is_cancelled(self.job_id):
+            raise GraphJobCancelled()
+        _write_status(self.job_id, "running", phase, done, total)
+
+def submit(fn: Callable[[ProgressReporter], Any]) -> str:
+    """Run `fn` in the background; it is passed a `ProgressReporter` and its
+    result must be JSON-serializable.
+
+    Returns: The id of the job."""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    _remove_old_jobs()
+    job_id = uuid4().hex
+    _write_status(job_id, "queued", "Waiting for a free worker")
+    _executor.submit(_run, job_id, fn)
+    return job_id
+
+def _run(job_id: str, fn: Callable[[ProgressReporter], Any]):
+    if is_cancelled(job_id):
+        _write_status(job_id, "cancelled", "Cancelled")
+        return
+    try:
+        _write_status(job_id, "running", "Starting")
+        result = fn(ProgressReporter(job_id))
+        # this is where the figure is encoded as JSON
+        with metrics.span("graph_jobs.write_result"):
+            _write_json(_path(job_id, "result.json"), result)
+        _write_status(job_id, "done", "Done")
+    except GraphJobCancelled:
+        logger.info(f"Graph job {job_id} was cancelled")
+        _write_status(job_id, "cancelled", "Cancelled")
+    except Exception as e:
+        logger.exception(f"Graph job {job_id} failed")
+        _write_status(job_id, "failed", "Failed", error=str(e))
+
+def cancel(job_id: str):
+    logger.info(f"Cancelling graph job {job_id}")
+    with open(_path(job_id, "cancel"), 'w'):
+        pass
+
+def is_cancelled(job_id: str) -> bool:
+    return os.path.exists(_path(job_id, "cancel"))
+
+def get_status(job_id: str) -> Optional[dict[str, Any]]:
+    try:
+        with open(_path(job_id, "status.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def get_result(job_id: str) -> Any:
+    with open(_path(job_id, "result.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _remove_old_jobs():
+    cutoff = time.time() - JOB_RETENTION
+    for name in os.listdir(JOBS_DIR):
+        path = os.path.join(JOBS_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
@@ -3,15 +3,30 @@ import logging
 import time
 import job_nimbus as jn
 from app_data import global_data as gd
-from dash import Output, html, Input, callback, dcc
+from app_data.sync import ensure_session
+from dash import Output, html, Input, State, callback, clientside_callback, dcc
+from flask import Flask, Response, jsonify, request
 import dash_bootstrap_components as dbc
 
 logger = logging.getLogger(__name__)
 
+# the polling interval for data status, in milliseconds; it doubles every time
+# nothing has changed, up to the maximum, and resets when something changes
+MIN_POLL_INTERVAL = 3000
+MAX_POLL_INTERVAL = 60000
+
+# the datasets whose status is shown, by the id used in the layout
+STATUS_DATASETS = {
+    "job-statuses": gd.jn_job_statuses,
+    "job-base-data": gd.jn_job_base_data,
+    "job-activities": gd.jn_job_activities,
+}
+
 layout = dbc.Card([
     dbc.CardHeader("JobNimbus Client"),
     dbc.CardBody([
-        dcc.Interval(id="poll-last-updated", interval=3000),
+        dcc.Interval(id="poll-data-status", interval=MIN_POLL_INTERVAL),
+        dcc.Store(id="data-status"),
         dbc.Row([
             dbc.Col(html.B("API Key"), width="auto"),
             dbc.Col(dbc.Input(
@@ -72,7 +87,7 @@ layout = dbc.Card([
 )
 def update_jn_api_key(jn_api_key):
     gd.jn_api_key.val = jn_api_key
-    jn.api.initialize_session(jn_api_key)
+    ensure_session()
 
 
 @callback(
@@ -84,17 +99,6 @@ def fetch_job_statuses(n_clicks):
     gd.jn_job_statuses.refresh()
     return gd.jn_job_statuses.last_updated
 
-@callback(
-    Output("last-updated-job-statuses", "children"),
-    Input("notify-job-statuses", "data"),
-    Input("poll-last-updated", "n_intervals"),
-)
-def render_job_statuses_last_update(data, n_intervals):
-    last_updated = gd.jn_job_statuses.last_updated
-    if last_updated is None:
-        return "No data (auto fetching when needed)"
-    return f"Last updated: {last_updated.strftime('%Y-%m-%d %H:%M:%S')}"
-
 @callback(
     Output("notify-job-base-data", "data"),
     Input("fetch-job-base-data-button", "n_clicks"),
@@ -104,17 +108,6 @@ def fetch_job_base_data(n_clicks):
     gd.jn_job_base_data.refresh()
     return gd.jn_job_base_data.last_updated
 
-@callback(
-    Output("last-updated-job-base-data", "children"),
-    Input("notify-job-base-data", "data"),
-    Input("poll-last-updated", "n_intervals"),
-)
-def render_job_base_data_last_update(data, n_intervals):
-    last_updated = gd.jn_job_base_data.last_updated
-    if last_updated is None:
-        return "No data (auto fetching when needed)"
-    return f"Last updated: {last_updated.strftime('%Y-%m-%d %H:%M:%S')}"
-
 @callback(
     Output("notify-job-activities", "data"),
     Input("fetch-job-activities-button", "n_clicks"),
@@ -124,13 +117,78 @@ def fetch_job_activities(n_clicks):
     gd.jn_job_activities.refresh()
     return gd.jn_job_activities.last_updated
 
-@callback(
-    Output("last-updated-job-activities", "children"),
-    Input("notify-job-activities", "data"),
-    Input("poll-last-updated", "n_intervals"),
-)
-def render_job_activities_last_update(data, n_intervals):
-    last_updated = gd.jn_job_activities.last_updated
+def data_status_etag() -> str:
+    for data_interface in STATUS_DATASETS.values():
+        data_interface.reload_if_changed()
+    return '"' + '-'.join(str(d.version) for d in STATUS_DATASETS.values()) + '"'
+
+def render_last_updated(last_updated: datetime | None) -> str:
     if last_updated is None:
         return "No data (auto fetching when needed)"
     return f"Last updated: {last_updated.strftime('%Y-%m-%d %H:%M:%S')}"
+
+def register_data_status_routes(server: Flask):
+    @server.route("/api/data-status")
+    def data_status():
+        """The last-updated labels of the datasets, or 304 Not Modified if none
+        of them have changed since the version in If-None-Match."""
+        etag = data_status_etag()
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status=304, headers={"ETag": etag})
+        response = jsonify({
+            "labels": {
+                name: render_last_updated(data_interface.last_updated)
+                for name, data_interface in STATUS_DATASETS.items()
+            },
+        })
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+# Poll the data status from the browser. This costs the server nothing more
+# than a version check when nothing has changed, backs off while nothing
+# changes and skips polls while the tab is hidden. A manual refresh triggers
+# an immediate poll.
+clientside_callback(
+    f"""
+    async function(n_intervals, notify_statuses, notify_base_data, notify_activities, status, interval) {{
+        const no_update = window.dash_clientside.no_update;
+        const backed_off = Math.min((interval || {MIN_POLL_INTERVAL}) * 2, {MAX_POLL_INTERVAL});
+        const triggered = window.dash_clientside.callback_context.triggered.map(t => t.prop_id);
+        const is_poll = triggered.every(id => id.startsWith("poll-data-status."));
+        if (is_poll && document.hidden) {{
+            return [no_update, backed_off, no_update, no_update, no_update];
+        }}
+        const headers = status && status.etag ? {{"If-None-Match": status.etag}} : {{}};
+        let response;
+        try {{
+            response = await fetch("/api/data-status", {{headers: headers, cache: "no-cache"}});
+        }} catch (e) {{
+            return [no_update, backed_off, no_update, no_update, no_update];
+        }}
+        if (response.status === 304 || !response.ok) {{
+            return [no_update, backed_off, no_update, no_update, no_update];
+        }}
+        const data = await response.json();
+        data.etag = response.headers.get("ETag");
+        return [
+            data,
+            {MIN_POLL_INTERVAL},
+            data.labels["job-statuses"],
+            data.labels["job-base-data"],
+            data.labels["job-activities"],
+        ];
+    }}
+    """,
+    Output("data-status", "data"),
+    Output("poll-data-status", "interval"),
+    Output("last-updated-job-statuses", "children"),
+    Output("last-updated-job-base-data", "children"),
+    Output("last-updated-job-activities", "children"),
+    Input("poll-data-status", "n_intervals"),
+    Input("notify-job-statuses", "data"),
+    Input("notify-job-base-data", "data"),
+    Input("notify-job-activities", "data"),
+    State("data-status", "data"),
+    State("poll-data-status", "interval"),
+)
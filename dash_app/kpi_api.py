@@ -0,0 +1,179 @@
+"""
+Read-only JSON endpoints for the numbers behind the KPI page, for other tools
+to poll.
+
+Every response carries an ETag derived from the data versions (and the
+request's parameters), which is checked before anything is computed, so a
+poller whose data hasn't changed gets a 304 without any recomputation.
+
+The flows are never computed in the request: they come from an embedding
+that is already cached, a prebuilt report or a finished background job, and
+otherwise a background job is started and the response is 202 Accepted,
+to be polled again.
+"""
+
+from collections import Counter
+from typing import Any, Callable, Optional
+import hashlib
+import logging
+import threading
+from flask import Flask, Response, jsonify, request
+from app_data import global_data as gd
+from app_data.prebuilt_reports import find_prebuilt_figure
+from dash_app.kpi_page import find_cached_embedding, get_embedding
+import dash_app.graph_jobs as graph_jobs
+import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# how long clients may reuse a response before revalidating it, in seconds
+API_MAX_AGE = 60
+# how long clients should wait before polling flows that are being computed,
+# in seconds
+FLOWS_RETRY_AFTER = 2
+
+# the background jobs computing flows, by (data version, graph settings,
+# remove cycles)
+_flows_jobs: dict[tuple, str] = {}
+_flows_jobs_lock = threading.Lock()
+
+FRESHNESS_DATASETS = {
+    "job_statuses": gd.jn_job_statuses,
+    "job_base_data": gd.jn_job_base_data,
+    "job_activities": gd.jn_job_activities,
+}
+
+def kpi_etag(*parts: Any) -> str:
+    """An ETag for the current data versions and the given request
+    parameters."""
+    key = repr((gd.data_version(), *parts))
+    return '"' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '"'
+
+def _not_modified(etag: str) -> bool:
+    return request.if_none_match.contains_weak(etag.strip('"'))
+
+def _conditional_json(etag: str, build: Callable[[], Any]) -> Response:
+    """Respond with 304 Not Modified if the client already has the version in
+    `etag`, otherwise with the JSON returned by `build`."""
+    if _not_modified(etag):
+        metrics.increment("kpi_api.not_modified")
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = f"max-age={API_MAX_AGE}, must-revalidate"
+    return response
+
+def _freshness() -> dict[str, Any]:
+    return {
+        name: {
+            "version": data_interface.version,
+            "last_updated": data_interface.last_updated.isoformat() if data_interface.last_updated else None,
+        }
+        for name, data_interface in FRESHNESS_DATASETS.items()
+    }
+
+def _flows_from_embedding(graph_embedding, status_group_nicknames: list[str]) -> dict[str, Any]:
+    labels = [*status_group_nicknames, "Job Created"]
+    source_indices, target_indices, values, avg_durations = graph_embedding.to_sankey()
+    return {
+        "labels": labels,
+        "node_num_jobs": [graph_embedding.graph.nodes[node_id]["num_jobs"] for node_id in range(len(labels))],
+        "source": source_indices,
+        "target": target_indices,
+        "value": values,
+        "avg_duration_days": avg_durations,
+    }
+
+def _flows_from_figure(figure: dict[str, Any]) -> dict[str, Any]:
+    sankey = figure["data"][0]
+    labels = sankey["node"]["label"]
+    link = sankey["link"]
+    # each job is counted at a node once for every link it leaves it by
+    node_num_jobs = [0] * len(labels)
+    for source, value in zip(link["source"], link["value"]):
+        node_num_jobs[source] += value
+    return {
+        "labels": labels,
+        "node_num_jobs": node_num_jobs,
+        "source": link["source"],
+        "target": link["target"],
+        "value": link["value"],
+        "avg_duration_days": link["customdata"],
+    }
+
+def _flows(graph_settings: str, remove_cycles: bool) -> Optional[dict[str, Any]]:
+    """The flows if they are available without computing them, otherwise
+    None, after making sure that a background job is computing them."""
+    if (cached := find_cached_embedding(graph_settings, remove_cycles)) is not None:
+        return {**_flows_from_embedding(*cached), "freshness": _freshness()}
+    if (figure := find_prebuilt_figure(graph_settings, "sankey", remove_cycles)) is not None:
+        return {**_flows_from_figure(figure), "freshness": _freshness()}
+
+    key = (gd.data_version(), graph_settings, remove_cycles)
+    with _flows_jobs_lock:
+        job_id = _flows_jobs.get(key)
+        status = graph_jobs.get_status(job_id) if job_id is not None else None
+        if status is not None and status["state"] == "done":
+            try:
+                return {**graph_jobs.get_result(job_id), "freshness": _freshness()}
+            except FileNotFoundError:
+                # the job's files were cleaned up
+                status = None
+        if status is None or status["state"] in ("failed", "cancelled"):
+            def compute_flows(progress: graph_jobs.ProgressReporter) -> dict[str, Any]:
+                graph_embedding, status_group_nicknames = get_embedding(
+                    graph_settings,
+                    remove_cycles,
+                    progress=lambda done, total: progress("Adding jobs to the graph", done, total),
+                )
+                return _flows_from_embedding(graph_embedding, status_group_nicknames)
+            # the jobs of older data versions are no longer needed
+            for old_key in [k for k in _flows_jobs if k[0] != key[0]]:
+                del _flows_jobs[old_key]
+            _flows_jobs[key] = graph_jobs.submit(compute_flows)
+            logger.info(f"Started graph job {_flows_jobs[key]} for KPI flows")
+    return None
+
+def _flows_pending() -> Response:
+    metrics.increment("kpi_api.flows_pending")
+    response = jsonify({"status": "pending", "freshness": _freshness()})
+    response.status_code = 202
+    response.headers["Retry-After"] = str(FLOWS_RETRY_AFTER)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+def _job_counts() -> dict[str, Any]:
+    base_data = gd.jn_job_base_data.val or {}
+    status_counts = Counter(job.status.name for job in base_data.values())
+    return {
+        "total": len(base_data),
+        "by_status": dict(status_counts.most_common()),
+        "freshness": _freshness(),
+    }
+
+def register_kpi_api_routes(server: Flask):
+    @server.route("/api/kpi/flows")
+    def kpi_flows():
+        """The status group flows of the Sankey graph. The graph settings are
+        given by the `settings` parameter, and default to the ones last used
+        on the KPI page; cycles are removed with `remove_cycles=1`. Responds
+        with 202 while the flows are being computed."""
+        graph_settings = request.args.get("settings") or gd.kpi_graph_settings.val
+        if not graph_settings:
+            return jsonify({"error": "No graph settings given and none saved"}), 400
+        remove_cycles = request.args.get("remove_cycles", "") not in ("", "0", "false")
+        etag = kpi_etag("flows", graph_settings, remove_cycles)
+        flows = None
+        if not _not_modified(etag) and (flows := _flows(graph_settings, remove_cycles)) is None:
+            return _flows_pending()
+        return _conditional_json(etag, lambda: flows)
+
+    @server.route("/api/kpi/job-counts")
+    def kpi_job_counts():
+        return _conditional_json(kpi_etag("job-counts"), _job_counts)
+
+    @server.route("/api/kpi/freshness")
+    def kpi_freshness():
+        return _conditional_json(kpi_etag("freshness"), _freshness)
@@ -1,17 +1,62 @@
-from collections import defaultdict
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+import threading
 import time
-from dash import Input, Output, callback, dcc, html, dash_table, State
+from dash import Input, Output, callback, ctx, dcc, html, dash_table, State, no_update
 import dash_bootstrap_components as dbc
 import logging
-from job_analysis.graph_embedding import JobGraphEmbedding
+import numpy as np
+from job_analysis import JobGraphEmbedding, ReceivablesAging, StatusAgingIndex, build_graph_embedding, compute_status_occupancy, parse_status_groups
+from job_analysis.receivables import AGE_BUCKET_LABELS
+from job_analysis.figures import make_occupancy_figure, make_sankey_figure
 import job_nimbus as jn
-from job_nimbus import JnActivity
 from app_data import global_data as gd
+from app_data.prebuilt_reports import find_prebuilt_figure
+from app_data.activity_store import open_activity_store
 import plotly.graph_objects as go
 import dash_app.jn_client as jn_client
+import dash_app.graph_jobs as graph_jobs
+import metrics
 
 logger = logging.getLogger(__name__)
 
+# the embeddings behind the most recently used graphs, least recently used
+# first, keyed by (data version, graph settings, remove cycles), kept so that
+# links can be drilled into, the mode can be switched and the API can be
+# served without recomputing them
+_embedding_cache: OrderedDict[tuple, tuple[JobGraphEmbedding, list[str]]] = OrderedDict()
+EMBEDDING_CACHE_SIZE = 4
+
+DRILLDOWN_PAGE_SIZE = 20
+
+# derived data, cached per data version
+_job_status_histories_cache: tuple[tuple, dict, jn.Diagnostics] | None = None
+_occupancy_cache: tuple[tuple, go.Figure] | None = None
+# graphs are generated in background threads, so the caches are built under
+# locks to keep two jobs from building the same thing at once
+_histories_lock = threading.Lock()
+_embedding_lock = threading.Lock()
+
+OCCUPANCY_DAYS = 365
+
+# the aging index, updated in place when the data changes
+_aging_index: tuple[tuple, StatusAgingIndex] | None = None
+_aging_lock = threading.Lock()
+
+# the default number of days before a job counts as stuck in a status group
+DEFAULT_STALE_DAYS = 30
+# how many of the oldest stuck jobs to list per status group
+NUM_OLDEST_STALE_JOBS = 5
+
+# the receivables aging for the graph settings, day and job statuses, updated
+# in place when the rest of the data changes
+_receivables_cache: tuple[tuple, tuple, ReceivablesAging] | None = None
+_receivables_lock = threading.Lock()
+
+# how often the page polls a running graph job, in milliseconds
+GRAPH_JOB_POLL_INTERVAL = 500
+
 kpi_layout = html.Div([
     html.H2("KPI Dashboard"),
     jn_client.layout,
@@ -24,105 +69,502 @@ kpi_layout = html.Div([
                 rows=5,
                 value=gd.kpi_graph_settings.val or "",
             ),
+            dbc.Switch(
+                id="remove-cycles-switch",
+                label="Remove cycles (only count the last time a job went through a status group)",
+                value=False,
+            ),
             dbc.Button(
                 "Generate Graph",
                 id="generate-graph-button",
             ),
+            dbc.Button(
+                "Cancel",
+                id="cancel-graph-button",
+                color="secondary",
+                className="ms-2",
+                disabled=True,
+            ),
+            dcc.Store(id="graph-job"),
+            dcc.Interval(id="poll-graph-job", interval=GRAPH_JOB_POLL_INTERVAL, disabled=True),
+            dbc.Progress(id="graph-progress", value=0, className="mt-2"),
+            html.Div(id="graph-progress-label"),
             dcc.Graph(id="graph-output"),
+            dcc.Store(id="graph-generation"),
+            dcc.Store(id="link-drilldown-selection"),
+            html.H5(id="link-drilldown-title"),
+            dash_table.DataTable(
+                id="link-drilldown-table",
+                columns=[
+                    {"name": "Job Number", "id": "job_number"},
+                    {"name": "Job Name", "id": "job_name"},
+                    {"name": "Sales Rep", "id": "sales_rep"},
+                    {"name": "Duration (days)", "id": "duration"},
+                ],
+                data=[],
+                page_action="custom",
+                page_current=0,
+                page_size=DRILLDOWN_PAGE_SIZE,
+                page_count=0,
+            ),
+        ])
+    ]),
+    dbc.Card([
+        dbc.CardHeader("Data Consistency Diagnostics"),
+        dbc.CardBody([
+            dash_table.DataTable(
+                id="diagnostics-table",
+                columns=[
+                    {"name": "Source", "id": "source"},
+                    {"name": "Problem", "id": "kind"},
+                    {"name": "Count", "id": "count"},
+                    {"name": "Samples", "id": "samples"},
+                ],
+                data=[],
+                style_cell={"whiteSpace": "pre-line", "textAlign": "left"},
+            ),
+        ])
+    ]),
+    dbc.Card([
+        dbc.CardHeader("Status Group Occupancy"),
+        dbc.CardBody([
+            dcc.Graph(id="occupancy-graph-output"),
+        ])
+    ]),
+    dbc.Card([
+        dbc.CardHeader("Stuck Jobs"),
+        dbc.CardBody([
+            html.P("Jobs that have been in their current status group for longer than its threshold. Edit a threshold to change it.", className="text-muted"),
+            dash_table.DataTable(
+                id="stale-jobs-table",
+                columns=[
+                    {"name": "Status Group", "id": "status_group"},
+                    {"name": "Threshold (days)", "id": "threshold_days", "type": "numeric", "editable": True},
+                    {"name": "Jobs", "id": "num_jobs"},
+                    {"name": "Stuck Jobs", "id": "num_stale"},
+                    {"name": "Median (days)", "id": "median_days"},
+                    {"name": "90th Percentile (days)", "id": "p90_days"},
+                    {"name": "Max (days)", "id": "max_days"},
+                    {"name": "Oldest Stuck Jobs", "id": "oldest"},
+                ],
+                data=[],
+                style_cell={"textAlign": "left"},
+            ),
+        ])
+    ]),
+    dbc.Card([
+        dbc.CardHeader("Receivables Aging"),
+        dbc.CardBody([
+            html.P(id="receivables-total"),
+            html.H5("By Status Group"),
+            dash_table.DataTable(
+                id="receivables-by-group-table",
+                columns=[{"name": "Status Group", "id": "name"}] + [
+                    {"name": label, "id": f"bucket_{i}"} for i, label in enumerate(AGE_BUCKET_LABELS)
+                ] + [{"name": "Total", "id": "total"}],
+                data=[],
+                style_cell={"textAlign": "right"},
+            ),
+            html.H5("By Sales Rep", className="mt-3"),
+            dash_table.DataTable(
+                id="receivables-by-sales-rep-table",
+                columns=[{"name": "Sales Rep", "id": "name"}] + [
+                    {"name": label, "id": f"bucket_{i}"} for i, label in enumerate(AGE_BUCKET_LABELS)
+                ] + [{"name": "Total", "id": "total"}],
+                data=[],
+                sort_action="native",
+                style_cell={"textAlign": "right"},
+            ),
         ])
     ]),
 ])
 
+def parse_graph_settings(graph_settings: str) -> tuple[list[frozenset[jn.JobStatus]], list[str]]:
+    """Parse the graph settings into status groups and their nicknames."""
+    return parse_status_groups(graph_settings, gd.jn_job_statuses.val)
+
+def _update_job_status_histories_cache():
+    global _job_status_histories_cache
+    with _histories_lock:
+        version = gd.data_version()
+        if _job_status_histories_cache is None or _job_status_histories_cache[0] != version:
+            # prefer the shared columnar store over loading every activity into
+            # this process
+            if (columns := open_activity_store()) is not None:
+                job_status_histories, diagnostics = jn.construct_all_job_status_histories_from_columns(columns, gd.jn_job_base_data.val, gd.jn_job_statuses.val)
+            else:
+                job_status_histories, diagnostics = jn.construct_all_job_status_histories(gd.jn_job_activities.val, gd.jn_job_base_data.val)
+            _job_status_histories_cache = (version, job_status_histories, diagnostics)
+
+def get_job_status_histories() -> dict[str, list]:
+    """Get the status history of every job, reconstructing them from the
+    activities only when the data has changed."""
+    _update_job_status_histories_cache()
+    return _job_status_histories_cache[1]
+
+def get_job_status_history_diagnostics() -> jn.Diagnostics:
+    """Get the inconsistencies found while constructing the job status
+    histories."""
+    _update_job_status_histories_cache()
+    return _job_status_histories_cache[2]
+
+def get_embedding(graph_settings: str, remove_cycles: bool = False, progress: Optional[Callable[[int, int], None]] = None) -> tuple[JobGraphEmbedding, list[str]]:
+    """Get the embedding of all jobs for the graph settings, and the
+    nicknames of its status groups, building it only when the settings or the
+    data have changed. Any worker process can rebuild the same embedding from
+    the settings, so links can be drilled into on a different worker than
+    the one that generated the graph."""
+    job_status_histories = get_job_status_histories()
+    with _embedding_lock:
+        cache_key = (gd.data_version(), graph_settings, remove_cycles)
+        if cache_key in _embedding_cache:
+            _embedding_cache.move_to_end(cache_key)
+        else:
+            status_groups, status_group_nicknames = parse_graph_settings(graph_settings)
+            graph_embedding, _ = build_graph_embedding(job_status_histories, status_groups, remove_cycles=remove_cycles, progress=progress)
+            _embedding_cache[cache_key] = (graph_embedding, status_group_nicknames)
+            if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+                _embedding_cache.popitem(last=False)
+        return _embedding_cache[cache_key]
+
+def find_cached_embedding(graph_settings: str, remove_cycles: bool = False) -> Optional[tuple[JobGraphEmbedding, list[str]]]:
+    """The same as `get_embedding` if the embedding is already cached, and
+    None otherwise, without building it or waiting for one to be built."""
+    return _embedding_cache.get((gd.data_version(), graph_settings, remove_cycles))
+
+@metrics.timed("generate_graph")
+def generate_graph(graph_settings: str, remove_cycles: bool, progress: graph_jobs.ProgressReporter) -> dict:
+    """Generate the Sankey graph for the settings; this runs as a background
+    job."""
+    logger.info(f"Generating graph with settings: {repr(graph_settings)} {remove_cycles=}")
+    generation = {"graph_settings": graph_settings, "remove_cycles": remove_cycles, "generated_at": time.time()}
+
+    # use the figure prebuilt by the command line tool if it is up to date; the
+    # embedding is then only built if a link is drilled into
+    if (prebuilt := find_prebuilt_figure(graph_settings, "sankey", remove_cycles)) is not None:
+        return {"figure": prebuilt, "generation": generation}
+
+    progress("Building job status histories")
+    get_job_status_histories()
+    graph_embedding, status_group_nicknames = get_embedding(
+        graph_settings,
+        remove_cycles,
+        progress=lambda done, total: progress("Adding jobs to the graph", done, total),
+    )
+    progress("Drawing the graph")
+    fig = make_sankey_figure(graph_embedding, status_group_nicknames)
+    fig = fig.to_plotly_json()
+    logger.info(f"Generated graph with labels {[*status_group_nicknames, 'Job Created']}")
+    return {"figure": fig, "generation": generation}
+
+def _cancel_unfinished(job: Optional[dict]):
+    if job is None:
+        return
+    status = graph_jobs.get_status(job["job_id"])
+    if status is not None and status["state"] in ("queued", "running"):
+        graph_jobs.cancel(job["job_id"])
+
 @callback(
-    Output("graph-output", "figure"),
+    Output("graph-job", "data"),
+    Output("poll-graph-job", "disabled"),
+    Output("cancel-graph-button", "disabled"),
     Input("generate-graph-button", "n_clicks"),
     State("graph-settings-input", "value"),
+    State("remove-cycles-switch", "value"),
+    State("graph-job", "data"),
     prevent_initial_call=True
 )
-def generate_graph(n_clicks, graph_settings):
-    if n_clicks is None:
-        return "No graph generated"
+def start_graph_job(n_clicks, graph_settings, remove_cycles, job):
+    if n_clicks is None or graph_settings is None:
+        return no_update, no_update, no_update
 
-    logger.info(f"Generating graph with settings: {repr(graph_settings)}")
+    assert isinstance(graph_settings, str)
+    gd.kpi_graph_settings.val = graph_settings
+    remove_cycles = bool(remove_cycles)
 
-    if graph_settings is None:
-        return "No graph settings provided"
+    # a new graph supersedes the one that is still being generated
+    _cancel_unfinished(job)
+    job_id = graph_jobs.submit(lambda progress: generate_graph(graph_settings, remove_cycles, progress))
+    logger.info(f"Started graph job {job_id}")
+    return {"job_id": job_id, "graph_settings": graph_settings, "remove_cycles": remove_cycles}, False, False
 
-    gd.kpi_graph_settings.val = graph_settings
+@callback(
+    Output("cancel-graph-button", "disabled", allow_duplicate=True),
+    Input("cancel-graph-button", "n_clicks"),
+    Input("graph-settings-input", "value"),
+    Input("remove-cycles-switch", "value"),
+    State("graph-job", "data"),
+    prevent_initial_call=True
+)
+def cancel_graph_job(n_clicks, graph_settings, remove_cycles, job):
+    # editing the settings also cancels the job, since its graph would no
+    # longer match them
+    if ctx.triggered_id != "cancel-graph-button" and job is not None \
+            and (graph_settings, bool(remove_cycles)) == (job["graph_settings"], job["remove_cycles"]):
+        return no_update
+    _cancel_unfinished(job)
+    return True
 
-    # group jobs by status name
-    status_by_name = defaultdict(set)
-    for job_id, status in gd.jn_job_statuses.val.items():
-        if status and status.name:
-            status_by_name[status.name].add(status)
+@callback(
+    Output("graph-output", "figure"),
+    Output("graph-generation", "data"),
+    Output("graph-progress", "value"),
+    Output("graph-progress-label", "children"),
+    Output("poll-graph-job", "disabled", allow_duplicate=True),
+    Output("cancel-graph-button", "disabled", allow_duplicate=True),
+    Input("poll-graph-job", "n_intervals"),
+    State("graph-job", "data"),
+    prevent_initial_call=True
+)
+def poll_graph_job(n_intervals, job):
+    if job is None:
+        return no_update, no_update, 0, "", True, True
+    status = graph_jobs.get_status(job["job_id"])
+    if status is None:
+        # the job's files were cleaned up, or never written
+        return no_update, no_update, 0, "The graph job was lost, please generate the graph again", True, True
 
-    # Split settings into rows, then split each row by commas
-    assert isinstance(graph_settings, str)
-    status_groups = []
-    status_group_nicknames = []
-    invalid_status_names = []
-    for row in graph_settings.strip().split('\n'):
-        status_group = set()
-        split = row.split(':', 1)
-        if len(split) == 2:
-            nickname = split[0].strip()
-            row = split[1].strip()
-        else:
-            nickname = row
-        for name in row.strip().split(','):
-            name = name.strip()
-            if name in status_by_name:
-                status_group.update(status_by_name[name])
-            else:
-                invalid_status_names.append(name)
-        status_groups.append(frozenset(status_group))
-        status_group_nicknames.append(nickname)
-    logger.info(f"Status groups: {status_groups}")
-    if invalid_status_names:
-        logger.warning(f"Invalid status names: {', '.join(invalid_status_names)}")
-
-    # construct job status histories from activities
-    activities_by_job = defaultdict(list)
-    for activity in gd.jn_job_activities.val:
-        activities_by_job[activity.primary_jnid].append(activity)
-    job_status_histories = {
-        job_jnid: jn.construct_job_status_history(activities, gd.jn_job_base_data.val[job_jnid].status)
-        for job_jnid, activities in activities_by_job.items() if job_jnid in gd.jn_job_base_data.val
-    }
+    state = status["state"]
+    if state == "done":
+        result = graph_jobs.get_result(job["job_id"])
+        return result["figure"], result["generation"], 100, "", True, True
+    if state == "cancelled":
+        return no_update, no_update, 0, "Cancelled", True, True
+    if state == "failed":
+        return no_update, no_update, 0, f"Failed to generate the graph: {status['error']}", True, True
+
+    label = status["phase"]
+    value = 0
+    if status["total"] > 0:
+        value = 100 * status["done"] / status["total"]
+        label = f"{label}: {status['done']} / {status['total']} jobs"
+    return no_update, no_update, value, label, False, False
 
-    # add all jobs to the embedding
-    graph_embedding = JobGraphEmbedding(status_groups, remove_cycles=False)
-    invisible_jobs = []
-    for job_id, status_history in job_status_histories.items():
-        added_edges = graph_embedding.add_status_history(status_history)
-        if added_edges == 0:
-            invisible_jobs.append(job_id)
-    if invisible_jobs:
-        logger.warning(f"{len(invisible_jobs)} jobs are invisible: {', '.join(invisible_jobs[:100])}")
-
-    # convert to sankey diagram
+@callback(
+    Output("link-drilldown-selection", "data"),
+    Output("link-drilldown-table", "page_current"),
+    Input("graph-output", "clickData"),
+    State("graph-generation", "data"),
+    prevent_initial_call=True
+)
+def select_drilldown_link(click_data, generation):
+    if not click_data or not click_data.get("points") or not generation:
+        return no_update, no_update
+    point = click_data["points"][0]
+    # dcc.Graph strips the object-valued keys of points, so a link's source
+    # and target aren't in the click data; they are looked up by the link's
+    # position instead, in the same order the figure was drawn in. Nodes have
+    # a layout position and depth, links don't.
+    if "pointNumber" not in point or "depth" in point or "x0" in point:
+        return no_update, no_update
+    graph_settings = generation["graph_settings"]
+    remove_cycles = generation.get("remove_cycles", False)
+    graph_embedding, status_group_nicknames = get_embedding(graph_settings, remove_cycles)
+    source_indices, target_indices, _, _ = graph_embedding.to_sankey()
+    link = point["pointNumber"]
+    if not 0 <= link < len(source_indices):
+        return no_update, no_update
     labels = [*status_group_nicknames, "Job Created"]
-    source_indices, target_indices, values, avg_duration = graph_embedding.to_sankey()
-    fig = go.Figure(data=[go.Sankey(
-        node=dict(
-            pad=15,
-            thickness=20,
-            line=dict(color="black", width=0.5),
-            label=labels,
-            color="lightblue"
-        ),
-        link=dict(
-            source=source_indices,
-            target=target_indices,
-            value=values,
-            customdata=avg_duration,
-            hovertemplate="%{source.label} -> %{target.label}<br>Average duration: %{customdata}"
-        )
-    )])
-    fig.update_layout(
-        title_text="Job Status Flow Diagram",
-        font_size=10,
-        height=800
-    )
-    logger.info(f"Generated graph with labels {[*status_group_nicknames, 'Job Created']}")
-    return fig
\ No newline at end of file
+    selection = {
+        "source": source_indices[link],
+        "target": target_indices[link],
+        "source_label": labels[source_indices[link]],
+        "target_label": labels[target_indices[link]],
+        "graph_settings": graph_settings,
+        "remove_cycles": remove_cycles,
+    }
+    return selection, 0
+
+@callback(
+    Output("link-drilldown-title", "children"),
+    Output("link-drilldown-table", "data"),
+    Output("link-drilldown-table", "page_count"),
+    Input("link-drilldown-selection", "data"),
+    Input("link-drilldown-table", "page_current"),
+    State("link-drilldown-table", "page_size"),
+    prevent_initial_call=True
+)
+def render_drilldown_table(selection, page_current, page_size):
+    if selection is None:
+        return no_update, no_update, no_update
+    graph_embedding, _ = get_embedding(selection["graph_settings"], selection.get("remove_cycles", False))
+
+    source, target = selection["source"], selection["target"]
+    num_jobs = graph_embedding.num_jobs_on_link(source, target)
+    start = (page_current or 0) * page_size
+    base_data = gd.jn_job_base_data.val or {}
+    rows = []
+    for jnid, duration in graph_embedding.jobs_on_link(source, target, start, start + page_size):
+        job = base_data.get(jnid)
+        rows.append({
+            "job_number": job.job_number if job else None,
+            "job_name": job.job_name if job else jnid,
+            "sales_rep": job.sales_rep if job else None,
+            "duration": round(duration.total_seconds() / 86400, 1),
+        })
+    title = f"{selection['source_label']} -> {selection['target_label']}: {num_jobs} jobs"
+    page_count = max(1, -(-num_jobs // page_size))
+    return title, rows, page_count
+
+@callback(
+    Output("occupancy-graph-output", "figure"),
+    Input("graph-generation", "data"),
+    prevent_initial_call=True
+)
+def generate_occupancy_graph(generation):
+    global _occupancy_cache
+
+    if generation is None:
+        return no_update
+    graph_settings = generation["graph_settings"]
+
+    cache_key = (gd.data_version(), graph_settings)
+    if _occupancy_cache is not None and _occupancy_cache[0] == cache_key:
+        return _occupancy_cache[1]
+    if (prebuilt := find_prebuilt_figure(graph_settings, "occupancy")) is not None:
+        return prebuilt
+
+    status_groups, status_group_nicknames = parse_graph_settings(graph_settings)
+    end = date.today()
+    start = end - timedelta(days=OCCUPANCY_DAYS - 1)
+    days, occupancy = compute_status_occupancy(get_job_status_histories(), status_groups, start, end)
+
+    fig = make_occupancy_figure(days, occupancy, status_group_nicknames)
+    _occupancy_cache = (cache_key, fig)
+    return fig
+
+@callback(
+    Output("diagnostics-table", "data"),
+    Input("graph-generation", "data"),
+    prevent_initial_call=True
+)
+def render_diagnostics(generation):
+    rows = []
+    sources = [
+        ("Activity parsing", gd.jn_job_activities_diagnostics.val),
+        ("Status histories", get_job_status_history_diagnostics()),
+    ]
+    for source, diagnostics in sources:
+        if diagnostics is None:
+            continue
+        for row in diagnostics.summary():
+            rows.append({
+                "source": source,
+                "kind": row["kind"],
+                "count": row["count"],
+                "samples": "\n".join(row["samples"]),
+            })
+    return rows
+
+def get_aging_index() -> StatusAgingIndex:
+    """Get the index of how long jobs have been in their current status,
+    updating it in place with the jobs that changed when the data changes."""
+    global _aging_index
+    with _aging_lock:
+        version = gd.data_version()
+        if _aging_index is None or _aging_index[0] != version:
+            aging_index = _aging_index[1] if _aging_index is not None else StatusAgingIndex()
+            aging_index.sync(gd.jn_job_base_data.val or {})
+            _aging_index = (version, aging_index)
+        return _aging_index[1]
+
+@callback(
+    Output("stale-jobs-table", "data"),
+    Input("graph-generation", "data"),
+    Input("stale-jobs-table", "data_timestamp"),
+    State("stale-jobs-table", "data"),
+    prevent_initial_call=True
+)
+def render_stale_jobs(generation, data_timestamp, rows):
+    if generation is None:
+        return no_update
+
+    thresholds = dict(gd.kpi_stale_thresholds.val or {})
+    if ctx.triggered_id == "stale-jobs-table" and rows:
+        for row in rows:
+            if isinstance(row.get("threshold_days"), (int, float)) and row["threshold_days"] >= 0:
+                thresholds[row["status_group"]] = row["threshold_days"]
+        gd.kpi_stale_thresholds.val = thresholds
+
+    status_groups, status_group_nicknames = parse_graph_settings(generation["graph_settings"])
+    aging_index = get_aging_index()
+    base_data = gd.jn_job_base_data.val or {}
+    now = datetime.now()
+    new_rows = []
+    for status_group, nickname in zip(status_groups, status_group_nicknames):
+        threshold = thresholds.get(nickname, DEFAULT_STALE_DAYS)
+        stale = aging_index.stale_jobs(status_group, now - timedelta(days=threshold))
+        dwell_days = aging_index.dwell_days(status_group, now)
+        percentiles = np.percentile(dwell_days, [50, 90, 100]).round(1).tolist() if len(dwell_days) > 0 else [None] * 3
+        oldest = [
+            base_data[jnid].job_number or jnid if jnid in base_data else jnid
+            for _, jnid in stale[:NUM_OLDEST_STALE_JOBS]
+        ]
+        new_rows.append({
+            "status_group": nickname,
+            "threshold_days": threshold,
+            "num_jobs": aging_index.num_jobs(status_group),
+            "num_stale": len(stale),
+            "median_days": percentiles[0],
+            "p90_days": percentiles[1],
+            "max_days": percentiles[2],
+            "oldest": ", ".join(oldest),
+        })
+    return new_rows
+
+def _update_receivables_aging(graph_settings: str) -> ReceivablesAging:
+    """Get the receivables aging for the status groups of the graph settings.
+    It is computed from all of the jobs once a day or when the job statuses
+    change (which changes the status groups), and when the other data changes
+    in between, only the totals of the jobs that changed are adjusted.
+
+    The aging is updated in place, so this must be called, and the aging
+    read, with `_receivables_lock` held."""
+    global _receivables_cache
+    version = gd.data_version()
+    key = (graph_settings, date.today(), gd.jn_job_statuses.version)
+    if _receivables_cache is None or _receivables_cache[1] != key:
+        status_groups, status_group_nicknames = parse_graph_settings(graph_settings)
+        aging = ReceivablesAging.build(gd.jn_job_base_data.val or {}, status_groups, status_group_nicknames, date.today())
+        _receivables_cache = (version, key, aging)
+    elif _receivables_cache[0] != version:
+        aging = _receivables_cache[2]
+        aging.sync(gd.jn_job_base_data.val or {})
+        _receivables_cache = (version, key, aging)
+    return _receivables_cache[2]
+
+def _format_cents(cents: int) -> str:
+    return f"${cents / 100:,.2f}"
+
+def _receivables_rows(names: list[str], totals: np.ndarray) -> list[dict]:
+    """One row per name from the totals of shape (num age buckets, num
+    names), leaving out names with nothing receivable."""
+    rows = []
+    for i, name in enumerate(names):
+        if not totals[:, i].any():
+            continue
+        rows.append({
+            "name": name,
+            **{f"bucket_{bucket}": _format_cents(int(total)) for bucket, total in enumerate(totals[:, i])},
+            "total": _format_cents(int(totals[:, i].sum())),
+        })
+    return rows
+
+@callback(
+    Output("receivables-total", "children"),
+    Output("receivables-by-group-table", "data"),
+    Output("receivables-by-sales-rep-table", "data"),
+    Input("graph-generation", "data"),
+    prevent_initial_call=True
+)
+def render_receivables(generation):
+    if generation is None:
+        return no_update, no_update, no_update
+    # read the aging before another callback can update it
+    with _receivables_lock:
+        aging = _update_receivables_aging(generation["graph_settings"])
+        num_jobs = int(aging.counts.sum())
+        total = f"{_format_cents(aging.total())} receivable from {num_jobs} jobs, aged as of {aging.as_of}"
+        by_group = _receivables_rows(aging.status_groups, aging.by_bucket_and_group())
+        by_sales_rep = _receivables_rows(aging.sales_reps, aging.by_bucket_and_sales_rep())
+    return total, by_group, by_sales_rep
@@ -0,0 +1,76 @@
+from dash import Input, Output, callback, html, dash_table
+from flask import Flask, Response, jsonify
+import dash_bootstrap_components as dbc
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics_layout = html.Div([
+    html.H2("Performance Metrics"),
+    dbc.Button("Refresh", id="refresh-metrics-button", className="mb-2"),
+    html.P([
+        "Also available as ",
+        html.A("JSON", href="/api/metrics"),
+        " and ",
+        html.A("Prometheus text", href="/api/metrics/prometheus"),
+        ".",
+    ]),
+    dbc.Card([
+        dbc.CardHeader("Timing Spans"),
+        dbc.CardBody([
+            dash_table.DataTable(
+                id="metrics-spans-table",
+                columns=[
+                    {"name": "Span", "id": "name"},
+                    {"name": "Count", "id": "count"},
+                    {"name": "Total (s)", "id": "total_seconds"},
+                    {"name": "Average (s)", "id": "avg_seconds"},
+                    {"name": "Max (s)", "id": "max_seconds"},
+                    {"name": "Last (s)", "id": "last_seconds"},
+                ],
+                data=[],
+                sort_action="native",
+            ),
+        ])
+    ], className="mb-4"),
+    dbc.Card([
+        dbc.CardHeader("Counters"),
+        dbc.CardBody([
+            dash_table.DataTable(
+                id="metrics-counters-table",
+                columns=[
+                    {"name": "Counter", "id": "name"},
+                    {"name": "Value", "id": "value"},
+                ],
+                data=[],
+                sort_action="native",
+            ),
+        ])
+    ]),
+])
+
+@callback(
+    Output("metrics-spans-table", "data"),
+    Output("metrics-counters-table", "data"),
+    Input("refresh-metrics-button", "n_clicks"),
+)
+def render_metrics(n_clicks):
+    data = metrics.snapshot()
+    spans = [
+        {"name": name, **{key: round(value, 6) for key, value in stats.items()}}
+        for name, stats in data["spans"].items()
+    ]
+    counters = [{"name": name, "value": value} for name, value in data["counters"].items()]
+    return spans, counters
+
+def register_metrics_routes(server: Flask):
+    """Expose the metrics on the Flask server underlying the Dash app."""
+
+    @server.route("/api/metrics")
+    def metrics_json():
+        return jsonify(metrics.snapshot())
+
+    @server.route("/api/metrics/prometheus")
+    def metrics_prometheus():
+        return Response(metrics.to_prometheus(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,132 @@
+from datetime import datetime
+from urllib.parse import quote, unquote
+from dash import Input, Output, callback, dcc, html
+import dash_bootstrap_components as dbc
+import logging
+from job_analysis import JobSearchIndex
+from app_data import global_data as gd
+from dash_app.kpi_page import get_job_status_histories
+
+logger = logging.getLogger(__name__)
+
+MAX_SEARCH_RESULTS = 50
+
+# the search index, cached per version of the job base data, which is all it
+# is built from
+_search_index_cache: tuple[int, JobSearchIndex] | None = None
+
+search_layout = html.Div([
+    html.H2("Job Search"),
+    dbc.Input(
+        id="job-search-input",
+        type="search",
+        placeholder="Job number, job name, claim number or insurance company",
+        autoFocus=True,
+        className="mb-2",
+    ),
+    html.P(id="job-search-summary", className="text-muted"),
+    html.Div(id="job-search-results"),
+])
+
+def get_search_index() -> JobSearchIndex:
+    """Get the search index of all jobs, building it only when the job base
+    data has changed."""
+    global _search_index_cache
+    gd.jn_job_base_data.reload_if_changed()
+    version = gd.jn_job_base_data.version
+    if _search_index_cache is None or _search_index_cache[0] != version:
+        _search_index_cache = (version, JobSearchIndex(gd.jn_job_base_data.val or {}))
+    return _search_index_cache[1]
+
+def job_href(jnid: str) -> str:
+    return f"/jobs/{quote(jnid, safe='')}"
+
+@callback(
+    Output("job-search-results", "children"),
+    Output("job-search-summary", "children"),
+    Input("job-search-input", "value"),
+)
+def search_jobs(query):
+    if not query:
+        return None, ""
+    jnids = get_search_index().search(query, limit=MAX_SEARCH_RESULTS + 1)
+    if not jnids:
+        return None, "No matching jobs"
+    summary = f"{len(jnids)} matching jobs" if len(jnids) <= MAX_SEARCH_RESULTS else f"More than {MAX_SEARCH_RESULTS} matching jobs, showing the first {MAX_SEARCH_RESULTS}"
+
+    base_data = gd.jn_job_base_data.val or {}
+    rows = []
+    for jnid in jnids[:MAX_SEARCH_RESULTS]:
+        # the data may have been reloaded without the job since the index was
+        # built
+        if (job := base_data.get(jnid)) is None:
+            continue
+        rows.append(html.Tr([
+            html.Td(dcc.Link(job.job_number or jnid, href=job_href(jnid))),
+            html.Td(job.job_name),
+            html.Td(job.status.name),
+            html.Td(job.insurance_company_name),
+            html.Td(job.insurance_claim_number),
+        ]))
+    table = dbc.Table([
+        html.Thead(html.Tr([
+            html.Th("Job Number"),
+            html.Th("Job Name"),
+            html.Th("Status"),
+            html.Th("Insurance Company"),
+            html.Th("Claim Number"),
+        ])),
+        html.Tbody(rows),
+    ], striped=True, hover=True, size="sm")
+    return table, summary
+
+def job_layout(jnid: str) -> html.Div:
+    """The page of a single job, with its status history rebuilt from its
+    activities."""
+    jnid = unquote(jnid)
+    job = (gd.jn_job_base_data.val or {}).get(jnid)
+    if job is None:
+        return html.Div([
+            html.H2("Job not found", className="text-danger"),
+            dcc.Link("Back to search", href="/search"),
+        ])
+
+    history = get_job_status_histories().get(jnid, [])
+    rows = []
+    for i, (timestamp, status) in enumerate(history):
+        until = history[i + 1][0] if i + 1 < len(history) else datetime.now()
+        rows.append(html.Tr([
+            html.Td(timestamp.strftime('%Y-%m-%d %H:%M')),
+            html.Td(status.name if status is not None else "Job Created"),
+            html.Td(round((until - timestamp).total_seconds() / 86400, 1)),
+        ]))
+
+    details = [
+        ("Status", job.status.name),
+        ("Sales Rep", job.sales_rep),
+        ("Insurance Company", job.insurance_company_name),
+        ("Claim Number", job.insurance_claim_number),
+        ("Amount Receivable", f"${job.amt_receivable / 100:,.2f}"),
+    ]
+    return html.Div([
+        dcc.Link("Back to search", href="/search"),
+        html.H2(f"{job.job_number or jnid}: {job.job_name or ''}"),
+        html.Dl([
+            element
+            for name, value in details
+            for element in (html.Dt(name), html.Dd(value if value is not None else "-"))
+        ]),
+        dbc.Card([
+            dbc.CardHeader("Status History"),
+            dbc.CardBody(
+                dbc.Table([
+                    html.Thead(html.Tr([
+                        html.Th("Date"),
+                        html.Th("Status"),
+                        html.Th("Days in Status"),
+                    ])),
+                    html.Tbody(rows),
+                ], striped=True, size="sm") if rows else html.P("No status changes recorded for this job", className="text-muted")
+            ),
+        ]),
+    ])
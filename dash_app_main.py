@@ -1,14 +1,19 @@
 # wrapper script for the dash_app.entry module
 
 import logging
+import os
 from threading import Timer
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# set AHITOOL_VERBOSE=1 to log every data consistency problem as it is found
+# (which job_nimbus.diagnostics reads itself) and to log at debug level
+VERBOSE = os.environ.get("AHITOOL_VERBOSE", "") not in ("", "0")
+
 # set up logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=logging.DEBUG if VERBOSE else logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s - %(message)s"
 )
 # console_handler = logging.StreamHandler(sys.stdout)
@@ -1 +1,6 @@
-from .graph_embedding import JobGraphEmbedding
\ No newline at end of file
+from .graph_embedding import JobGraphEmbedding, build_graph_embedding
+from .occupancy import compute_status_occupancy
+from .status_groups import parse_status_groups
+from .job_search import JobSearchIndex
+from .aging import StatusAgingIndex
+from .receivables import ReceivablesAging
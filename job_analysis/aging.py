@@ -0,0 +1,88 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Iterable, Optional
+import numpy as np
+from job_nimbus import JobParsedBaseData, JobStatus
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class StatusAgingIndex:
+    """
+    Jobs bucketed by their current status, each bucket sorted by when the job
+    entered the status (`status_mod_date`), so that the jobs that have been
+    in a status since before some time are a prefix of its bucket, found by
+    binary search.
+
+    The index is kept up to date in place: `sync` only moves the jobs whose
+    status or status date changed since the last sync.
+    """
+
+    def __init__(self):
+        # the (status, status timestamp) that each job is indexed under
+        self.entries: dict[str, tuple[JobStatus, Optional[float]]] = {}
+        # for each status, the sorted (status timestamp, jnid) of its jobs
+        self.buckets: dict[JobStatus, list[tuple[float, str]]] = {}
+        # for each status, the jobs whose status date is unknown
+        self.undated: dict[JobStatus, set[str]] = {}
+
+    def upsert(self, jnid: str, status: JobStatus, status_mod_date: Optional[datetime]):
+        timestamp = status_mod_date.timestamp() if status_mod_date is not None else None
+        if (entry := self.entries.get(jnid)) is not None:
+            if entry == (status, timestamp):
+                return
+            self.remove(jnid)
+        self.entries[jnid] = (status, timestamp)
+        if timestamp is None:
+            self.undated.setdefault(status, set()).add(jnid)
+        else:
+            insort(self.buckets.setdefault(status, []), (timestamp, jnid))
+
+    def remove(self, jnid: str):
+        if (entry := self.entries.pop(jnid, None)) is None:
+            return
+        status, timestamp = entry
+        if timestamp is None:
+            self.undated[status].discard(jnid)
+        else:
+            bucket = self.buckets[status]
+            del bucket[bisect_left(bucket, (timestamp, jnid))]
+
+    @metrics.timed("StatusAgingIndex.sync")
+    def sync(self, base_data: dict[str, JobParsedBaseData]) -> int:
+        """Update the index to match the base data.
+
+        Returns: The number of jobs that were added, moved or removed."""
+        num_updates = 0
+        for jnid, job in base_data.items():
+            timestamp = job.status_mod_date.timestamp() if job.status_mod_date is not None else None
+            if self.entries.get(jnid) != (job.status, timestamp):
+                self.upsert(jnid, job.status, job.status_mod_date)
+                num_updates += 1
+        for jnid in [jnid for jnid in self.entries if jnid not in base_data]:
+            self.remove(jnid)
+            num_updates += 1
+        logger.info(f"Updated {num_updates} jobs in the aging index")
+        return num_updates
+
+    def num_jobs(self, statuses: Iterable[JobStatus]) -> int:
+        return sum(len(self.buckets.get(s, ())) + len(self.undated.get(s, ())) for s in statuses)
+
+    def stale_jobs(self, statuses: Iterable[JobStatus], entered_before: datetime) -> list[tuple[datetime, str]]:
+        """The (status date, jnid) of the jobs in any of the statuses that
+        entered it before `entered_before`, oldest first."""
+        cutoff = entered_before.timestamp()
+        stale = []
+        for status in statuses:
+            bucket = self.buckets.get(status, [])
+            stale.extend(bucket[:bisect_left(bucket, (cutoff,))])
+        stale.sort()
+        return [(datetime.fromtimestamp(timestamp), jnid) for timestamp, jnid in stale]
+
+    def dwell_days(self, statuses: Iterable[JobStatus], now: datetime) -> np.ndarray:
+        """How many days each dated job in any of the statuses has been in
+        its current status."""
+        timestamps = [timestamp for status in statuses for timestamp, _ in self.buckets.get(status, ())]
+        return (now.timestamp() - np.array(timestamps, dtype=np.float64)) / 86400
@@ -0,0 +1,47 @@
+from datetime import date
+import numpy as np
+import plotly.graph_objects as go
+from .graph_embedding import JobGraphEmbedding
+
+def make_sankey_figure(graph_embedding: JobGraphEmbedding, status_group_nicknames: list[str]) -> go.Figure:
+    labels = [*status_group_nicknames, "Job Created"]
+    source_indices, target_indices, values, avg_duration = graph_embedding.to_sankey()
+    fig = go.Figure(data=[go.Sankey(
+        node=dict(
+            pad=15,
+            thickness=20,
+            line=dict(color="black", width=0.5),
+            label=labels,
+            color="lightblue"
+        ),
+        link=dict(
+            source=source_indices,
+            target=target_indices,
+            value=values,
+            customdata=avg_duration,
+            hovertemplate="%{source.label} -> %{target.label}<br>Average duration: %{customdata}"
+        )
+    )])
+    fig.update_layout(
+        title_text="Job Status Flow Diagram",
+        font_size=10,
+        height=800
+    )
+    return fig
+
+def make_occupancy_figure(days: list[date], occupancy: np.ndarray, status_group_nicknames: list[str]) -> go.Figure:
+    fig = go.Figure()
+    for nickname, counts in zip(status_group_nicknames, occupancy):
+        fig.add_trace(go.Scatter(
+            x=days,
+            y=counts,
+            name=nickname,
+            mode="lines",
+            stackgroup="occupancy",
+        ))
+    fig.update_layout(
+        title_text="Jobs in Each Status Group",
+        font_size=10,
+        height=600
+    )
+    return fig
@@ -1,7 +1,10 @@
+from array import array
 from datetime import datetime, timedelta
+from typing import Callable, Optional
 from networkx import MultiDiGraph
-from job_nimbus import JobStatus
+from job_nimbus import JobStatus, diagnostics
 import logging
+import metrics
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -22,8 +25,18 @@ class JobGraphEmbedding:
         self.graph.add_node(self.start_node_id, num_jobs=0)
         self.remove_cycles = remove_cycles
 
-    def add_status_history(self, status_history: list[(datetime, JobStatus)]) -> int:
+        # the jnids of the jobs added to the embedding, interned so that each
+        # link can refer to its jobs by index
+        self.jnids: list[str] = []
+        self.jnid_to_index: dict[str, int] = {}
+        # for each link (from_node_id, to_node_id), the indices of the jobs
+        # that went through it and the seconds each one took
+        self.link_job_indices: dict[tuple[int, int], array] = {}
+        self.link_job_durations: dict[tuple[int, int], array] = {}
+
+    def add_status_history(self, status_history: list[(datetime, JobStatus)], jnid: Optional[str] = None) -> int:
         filtered_status_history = filter_status_history(status_history, self.status_to_node, self.remove_cycles)
+        job_index = self._intern_jnid(jnid) if jnid is not None else None
 
         for i in range(len(filtered_status_history)):
             if i == 0:
@@ -38,8 +51,41 @@ class JobGraphEmbedding:
             # add an edge for this status
             to_date, to_node_id = filtered_status_history[i]
             self.graph.add_edge(from_node_id, to_node_id, duration=to_date - from_date)
+
+            # record the job in the link index
+            if job_index is not None:
+                link = (from_node_id, to_node_id)
+                if link not in self.link_job_indices:
+                    self.link_job_indices[link] = array('I')
+                    self.link_job_durations[link] = array('d')
+                self.link_job_indices[link].append(job_index)
+                self.link_job_durations[link].append((to_date - from_date).total_seconds())
         return len(filtered_status_history)
 
+    def _intern_jnid(self, jnid: str) -> int:
+        if (index := self.jnid_to_index.get(jnid)) is None:
+            index = len(self.jnids)
+            self.jnids.append(jnid)
+            self.jnid_to_index[jnid] = index
+        return index
+
+    def num_jobs_on_link(self, source: int, target: int) -> int:
+        return len(self.link_job_indices.get((source, target), ()))
+
+    def jobs_on_link(self, source: int, target: int, start: int = 0, stop: Optional[int] = None) -> list[tuple[str, timedelta]]:
+        """Return the (jnid, duration) of the jobs that went through the link
+        from `source` to `target`, sliced by `start` and `stop`."""
+        link = (source, target)
+        if link not in self.link_job_indices:
+            return []
+        job_indices = self.link_job_indices[link][start:stop]
+        durations = self.link_job_durations[link][start:stop]
+        return [
+            (self.jnids[job_index], timedelta(seconds=duration))
+            for job_index, duration in zip(job_indices, durations)
+        ]
+
+    @metrics.timed("JobGraphEmbedding.to_sankey")
     def to_sankey(self):
         source_indices = []
         target_indices = []
@@ -60,27 +106,60 @@ class JobGraphEmbedding:
                     avg_durations.append(avg_duration)
         return source_indices, target_indices, values, avg_durations
 
+# how many jobs to add between calls to the progress callback
+PROGRESS_STEP = 1000
+
+def build_graph_embedding(
+    job_status_histories: dict[str, list[(datetime, JobStatus)]],
+    status_partition: list[frozenset[JobStatus]],
+    remove_cycles: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> tuple[JobGraphEmbedding, list[str]]:
+    """Add all of the jobs to a new embedding. If given, `progress` is called
+    with the number of jobs added so far and the total every few jobs; it can
+    raise to stop the build.
+
+    Returns: The embedding and the jnids of the jobs that are not visible in
+    it because none of their statuses are in a status group."""
+    graph_embedding = JobGraphEmbedding(status_partition, remove_cycles)
+    invisible_jobs = []
+    total = len(job_status_histories)
+    with metrics.span("JobGraphEmbedding.build"):
+        for i, (job_id, status_history) in enumerate(job_status_histories.items()):
+            if progress is not None and i % PROGRESS_STEP == 0:
+                progress(i, total)
+            added_edges = graph_embedding.add_status_history(status_history, job_id)
+            if added_edges == 0:
+                invisible_jobs.append(job_id)
+        if progress is not None:
+            progress(total, total)
+    if invisible_jobs:
+        logger.warning(f"{len(invisible_jobs)} jobs are invisible: {', '.join(invisible_jobs[:100])}")
+    return graph_embedding, invisible_jobs
+
 def filter_status_history(status_history: list[(datetime, JobStatus)], status_to_node_id: dict[JobStatus, int], remove_cycles: bool = False) -> list[tuple[datetime, int]]:
     try:
         filtered_status_history = []
-        node_encounters = set()
+        # the position of each node in the filtered history, so that a cycle
+        # can be cut off at once; every entry is added and removed at most
+        # once, so this is linear in the length of the history
+        node_positions = {}
         last_node_id = None
         for date, status in status_history:
             if (node_id := status_to_node_id.get(status)) is not None and node_id != last_node_id:
-                if remove_cycles and node_id in node_encounters:
+                if remove_cycles and (position := node_positions.get(node_id)) is not None:
                     # we've seen this node before, so remove the cycle
-                    # logger.info(f"Removing cycle: {filtered_status_history=} {node_encounters=} {status=} {date=} {node_id=}")
-                    while filtered_status_history[-1][1] != node_id:
-                        _, popped_node_id = filtered_status_history.pop()
-                        node_encounters.discard(popped_node_id)
+                    for _, removed_node_id in filtered_status_history[position + 1:]:
+                        del node_positions[removed_node_id]
+                    del filtered_status_history[position + 1:]
                 else:
                     # we've never seen this node before
-                    node_encounters.add(node_id)
+                    node_positions[node_id] = len(filtered_status_history)
                     filtered_status_history.append((date, node_id))
                 last_node_id = node_id
 
-        # assert no cycles
-        if remove_cycles:
+        # assert no cycles; this is only worth its cost when debugging
+        if remove_cycles and diagnostics.verbose:
             node_encounters = set()
             for date, node_id in filtered_status_history:
                 if node_id in node_encounters:
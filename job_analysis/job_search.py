@@ -0,0 +1,79 @@
+from bisect import bisect_left
+from typing import Optional
+from job_nimbus import JobParsedBaseData
+import logging
+import re
+import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# the fields of a job that can be searched
+SEARCH_FIELDS = ["job_number", "job_name", "insurance_claim_number", "insurance_company_name"]
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class JobSearchIndex:
+    """
+    An in-memory index for searching jobs by the words in their searchable
+    fields, as the user types.
+
+    There are two indexes over the same keys: a token index from each key to
+    the jobs that have it, for exact matches, and a sorted list of the keys,
+    where all of the keys starting with a prefix are found by bisection. The
+    keys are the lowercase words of the fields, plus each whole field with its
+    punctuation removed, so that e.g. a claim number "CLM-2023-0042" is found
+    by "clm2023" as well as by "2023".
+    """
+
+    def __init__(self, base_data: dict[str, JobParsedBaseData]):
+        self.jnids: list[str] = []
+        self.token_index: dict[str, list[int]] = {}
+        with metrics.span("JobSearchIndex.build"):
+            for job_index, (jnid, job) in enumerate(base_data.items()):
+                self.jnids.append(jnid)
+                keys = set()
+                for field in SEARCH_FIELDS:
+                    if (value := getattr(job, field)) is None:
+                        continue
+                    tokens = tokenize(value)
+                    keys.update(tokens)
+                    keys.add("".join(tokens))
+                keys.discard("")
+                for key in keys:
+                    self.token_index.setdefault(key, []).append(job_index)
+            self.sorted_keys = sorted(self.token_index)
+        logger.info(f"Indexed {len(self.jnids)} jobs by {len(self.sorted_keys)} keys")
+
+    def _prefix_matches(self, prefix: str) -> set[int]:
+        jobs = set()
+        i = bisect_left(self.sorted_keys, prefix)
+        while i < len(self.sorted_keys) and self.sorted_keys[i].startswith(prefix):
+            jobs.update(self.token_index[self.sorted_keys[i]])
+            i += 1
+        return jobs
+
+    def search(self, query: str, limit: Optional[int] = 50) -> list[str]:
+        """Return the jnids of the jobs that match every word of the query.
+        The last word only has to be a prefix, since the user may still be
+        typing it, and so do the others if they match no key exactly. Jobs
+        that match the last word exactly come first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with metrics.span("JobSearchIndex.search"):
+            *complete_tokens, last_token = tokens
+            matches = None
+            for token in complete_tokens:
+                token_matches = set(self.token_index.get(token, ())) or self._prefix_matches(token)
+                matches = token_matches if matches is None else matches & token_matches
+                if not matches:
+                    return []
+            prefix_matches = self._prefix_matches(last_token)
+            matches = prefix_matches if matches is None else matches & prefix_matches
+            exact = set(self.token_index.get(last_token, ()))
+            ranked = sorted(matches, key=lambda job_index: (job_index not in exact, job_index))
+            return [self.jnids[job_index] for job_index in ranked[:limit]]
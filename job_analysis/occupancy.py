@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+from job_nimbus import JobStatus
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+def compute_status_occupancy(
+    job_status_histories: dict[str, list[(datetime, JobStatus)]],
+    status_partition: list[frozenset[JobStatus]],
+    start: date,
+    end: date,
+) -> tuple[list[date], np.ndarray]:
+    """
+    Count how many jobs were in each status group at the end of each day from
+    `start` to `end` (inclusive).
+
+    Each time a job enters a status group becomes a +1 event for that group,
+    and each time it leaves becomes a -1 event. The events are bucketed by day
+    and summed cumulatively, so every job history is only looked at once.
+
+    Returns: The list of days and an array of shape (num groups, num days)
+    with the number of jobs in each group on each day.
+    """
+    status_to_group = {}
+    for group_id, status_group in enumerate(status_partition):
+        for status in status_group:
+            status_to_group[status] = group_id
+
+    num_days = (end - start).days + 1
+    start_ordinal = start.toordinal()
+    event_groups = []
+    event_days = []
+    event_deltas = []
+    for status_history in job_status_histories.values():
+        for i, (entered, status) in enumerate(status_history):
+            group_id = status_to_group.get(status)
+            if group_id is None:
+                continue
+            event_groups.append(group_id)
+            event_days.append(entered.toordinal() - start_ordinal)
+            event_deltas.append(1)
+            if i + 1 < len(status_history):
+                event_groups.append(group_id)
+                event_days.append(status_history[i + 1][0].toordinal() - start_ordinal)
+                event_deltas.append(-1)
+
+    deltas = np.zeros((len(status_partition), num_days), dtype=np.int64)
+    if event_deltas:
+        event_groups = np.asarray(event_groups, dtype=np.int64)
+        # events before the start count towards the first day; events after
+        # the end don't count at all
+        event_days = np.maximum(np.asarray(event_days, dtype=np.int64), 0)
+        event_deltas = np.asarray(event_deltas, dtype=np.int64)
+        in_range = event_days < num_days
+        np.add.at(deltas, (event_groups[in_range], event_days[in_range]), event_deltas[in_range])
+    occupancy = np.cumsum(deltas, axis=1)
+
+    days = [start + timedelta(days=i) for i in range(num_days)]
+    return days, occupancy
@@ -0,0 +1,151 @@
+from datetime import date, datetime, time
+from typing import Optional
+import numpy as np
+from job_nimbus import JobParsedBaseData, JobStatus
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# the age buckets of receivables in days: 0-30, 31-60, 61-90, 91-120 and over
+# 120, plus one for receivables whose age is unknown
+AGE_BUCKET_STARTS = [31, 61, 91, 121]
+AGE_BUCKET_LABELS = ["0-30 days", "31-60 days", "61-90 days", "91-120 days", "Over 120 days", "Unknown age"]
+UNKNOWN_AGE_BUCKET = len(AGE_BUCKET_LABELS) - 1
+
+UNASSIGNED_SALES_REP = "Unassigned"
+OTHER_STATUS_GROUP = "Other"
+
+def receivable_since(job: JobParsedBaseData) -> Optional[datetime]:
+    """When the job's receivable started aging: when it was installed,
+    otherwise when its contract was signed, otherwise when it entered its
+    current status."""
+    return job.milestone_dates.install_date or job.milestone_dates.contract_date or job.status_mod_date
+
+class ReceivablesAging:
+    """
+    The total amount receivable (in cents) and the number of jobs with a
+    receivable, by age bucket, sales rep and status group, as arrays of shape
+    (num age buckets, num sales reps, num status groups).
+
+    The totals are computed from all of the jobs at once with numpy, and then
+    kept up to date by adding and subtracting the contributions of the jobs
+    that are upserted or removed. Ages are as of a fixed day, so a new
+    instance is needed when the day changes.
+    """
+
+    def __init__(self, status_partition: list[frozenset[JobStatus]], status_group_nicknames: list[str], as_of: date):
+        self.as_of = as_of
+        self._as_of_timestamp = datetime.combine(as_of, time.max).timestamp()
+        self.status_to_group = {}
+        for group_id, status_group in enumerate(status_partition):
+            for status in status_group:
+                self.status_to_group[status] = group_id
+        # jobs in no status group are in the last group
+        self.status_groups = [*status_group_nicknames, OTHER_STATUS_GROUP]
+        self.sales_reps: list[str] = []
+        self.sales_rep_to_index: dict[str, int] = {}
+        self.totals = np.zeros((len(AGE_BUCKET_LABELS), 0, len(self.status_groups)), dtype=np.int64)
+        self.counts = np.zeros_like(self.totals)
+        # the (age bucket, sales rep, status group, amount) that each job with a
+        # receivable contributes to the totals
+        self.contributions: dict[str, tuple[int, int, int, int]] = {}
+
+    def _sales_rep_index(self, sales_rep: Optional[str]) -> int:
+        sales_rep = sales_rep or UNASSIGNED_SALES_REP
+        if (index := self.sales_rep_to_index.get(sales_rep)) is None:
+            index = self.sales_rep_to_index[sales_rep] = len(self.sales_reps)
+            self.sales_reps.append(sales_rep)
+        if index >= self.totals.shape[1]:
+            # grow the rep axis, with some room for more reps
+            padding = np.zeros((self.totals.shape[0], max(1, self.totals.shape[1]), self.totals.shape[2]), dtype=np.int64)
+            self.totals = np.concatenate([self.totals, padding], axis=1)
+            self.counts = np.concatenate([self.counts, padding], axis=1)
+        return index
+
+    def _age_bucket(self, since: Optional[datetime]) -> int:
+        if since is None:
+            return UNKNOWN_AGE_BUCKET
+        age_days = (self._as_of_timestamp - since.timestamp()) / 86400
+        return int(np.searchsorted(AGE_BUCKET_STARTS, age_days, side='right'))
+
+    def _contribution(self, job: JobParsedBaseData) -> Optional[tuple[int, int, int, int]]:
+        if job.amt_receivable == 0:
+            return None
+        return (
+            self._age_bucket(receivable_since(job)),
+            self._sales_rep_index(job.sales_rep),
+            self.status_to_group.get(job.status, len(self.status_groups) - 1),
+            job.amt_receivable,
+        )
+
+    @classmethod
+    @metrics.timed("ReceivablesAging.build")
+    def build(cls, base_data: dict[str, JobParsedBaseData], status_partition: list[frozenset[JobStatus]], status_group_nicknames: list[str], as_of: date) -> 'ReceivablesAging':
+        aging = cls(status_partition, status_group_nicknames, as_of)
+        jobs = [job for job in base_data.values() if job.amt_receivable != 0]
+        since = [receivable_since(job) for job in jobs]
+        timestamps = np.array([s.timestamp() if s is not None else np.nan for s in since], dtype=np.float64)
+        age_days = (aging._as_of_timestamp - timestamps) / 86400
+        buckets = np.where(np.isnan(age_days), UNKNOWN_AGE_BUCKET, np.searchsorted(AGE_BUCKET_STARTS, age_days, side='right'))
+        sales_reps = np.array([aging._sales_rep_index(job.sales_rep) for job in jobs], dtype=np.intp)
+        groups = np.array([aging.status_to_group.get(job.status, len(aging.status_groups) - 1) for job in jobs], dtype=np.intp)
+        amounts = np.array([job.amt_receivable for job in jobs], dtype=np.int64)
+
+        np.add.at(aging.totals, (buckets, sales_reps, groups), amounts)
+        np.add.at(aging.counts, (buckets, sales_reps, groups), 1)
+        aging.contributions = {
+            job.jnid: contribution
+            for job, contribution in zip(jobs, zip(buckets.tolist(), sales_reps.tolist(), groups.tolist(), amounts.tolist()))
+        }
+        logger.info(f"Aged {len(jobs)} receivables totalling ${amounts.sum() / 100:,.2f}")
+        return aging
+
+    def remove(self, jnid: str):
+        if (contribution := self.contributions.pop(jnid, None)) is None:
+            return
+        bucket, sales_rep, group, amount = contribution
+        self.totals[bucket, sales_rep, group] -= amount
+        self.counts[bucket, sales_rep, group] -= 1
+
+    def _apply(self, jnid: str, contribution: Optional[tuple[int, int, int, int]]):
+        self.remove(jnid)
+        if contribution is not None:
+            bucket, sales_rep, group, amount = contribution
+            self.totals[bucket, sales_rep, group] += amount
+            self.counts[bucket, sales_rep, group] += 1
+            self.contributions[jnid] = contribution
+
+    def upsert(self, job: JobParsedBaseData):
+        contribution = self._contribution(job)
+        if contribution != self.contributions.get(job.jnid):
+            self._apply(job.jnid, contribution)
+
+    @metrics.timed("ReceivablesAging.sync")
+    def sync(self, base_data: dict[str, JobParsedBaseData]) -> int:
+        """Upsert every job and remove the jobs that are gone, which only
+        touches the totals of the jobs whose contribution changed.
+
+        Returns: The number of jobs whose contribution changed."""
+        num_updates = 0
+        for job in base_data.values():
+            if (contribution := self._contribution(job)) != self.contributions.get(job.jnid):
+                self._apply(job.jnid, contribution)
+                num_updates += 1
+        for jnid in [jnid for jnid in self.contributions if jnid not in base_data]:
+            self.remove(jnid)
+            num_updates += 1
+        logger.info(f"Updated {num_updates} receivables")
+        return num_updates
+
+    def total(self) -> int:
+        return int(self.totals.sum())
+
+    def by_bucket_and_group(self) -> np.ndarray:
+        """The totals of shape (num age buckets, num status groups)."""
+        return self.totals.sum(axis=1)
+
+    def by_bucket_and_sales_rep(self) -> np.ndarray:
+        """The totals of shape (num age buckets, num sales reps)."""
+        return self.totals[:, :len(self.sales_reps)].sum(axis=2)
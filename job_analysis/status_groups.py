@@ -0,0 +1,47 @@
+from collections import defaultdict
+from job_nimbus import JobStatus
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+def parse_status_groups(graph_settings: str, statuses: dict[int, JobStatus]) -> tuple[list[frozenset[JobStatus]], list[str]]:
+    """
+    Parse graph settings of the form
+
+        Category A: Status 1, Status 2, Status 3
+        Category B: Status 4, Status 5, Status 6
+
+    into status groups and their nicknames. Rows without a nickname are
+    nicknamed after the whole row.
+    """
+    # group jobs by status name
+    status_by_name = defaultdict(set)
+    for job_id, status in statuses.items():
+        if status and status.name:
+            status_by_name[status.name].add(status)
+
+    # Split settings into rows, then split each row by commas
+    status_groups = []
+    status_group_nicknames = []
+    invalid_status_names = []
+    for row in graph_settings.strip().split('\n'):
+        status_group = set()
+        split = row.split(':', 1)
+        if len(split) == 2:
+            nickname = split[0].strip()
+            row = split[1].strip()
+        else:
+            nickname = row
+        for name in row.strip().split(','):
+            name = name.strip()
+            if name in status_by_name:
+                status_group.update(status_by_name[name])
+            else:
+                invalid_status_names.append(name)
+        status_groups.append(frozenset(status_group))
+        status_group_nicknames.append(nickname)
+    logger.info(f"Status groups: {status_groups}")
+    if invalid_status_names:
+        logger.warning(f"Invalid status names: {', '.join(invalid_status_names)}")
+    return status_groups, status_group_nicknames
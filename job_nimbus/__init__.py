@@ -4,9 +4,16 @@ from .activities import (
     JnActivityStatusChanged,
     JnActivityJobModified,
     parse_jn_activity,
+    parse_all_jn_activities,
     construct_job_status_history,
+    construct_all_job_status_histories,
+)
+from .activity_columns import (
+    ActivityColumns,
+    construct_all_job_status_histories_from_columns,
 )
 from . import api
+from .diagnostics import Diagnostics, set_verbose
 from .base_data import (
     JobStatus,
     JobInsuranceStatus,
@@ -1,9 +1,12 @@
 import re
-from .base_data import JobStatus
+from .base_data import JobStatus, JobParsedBaseData
+from .diagnostics import Diagnostics
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Optional
 import logging
+import metrics
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -77,7 +80,12 @@ class JnActivityJobModified(JnActivity):
             updates=updates
         )
 
-def parse_jn_activity(json: dict[str, Any]) -> JnActivity:
+def parse_jn_activity(json: dict[str, Any], diagnostics: Optional[Diagnostics] = None) -> JnActivity:
+    """
+    Parse a JobNimbus activity, falling back to a generic activity if it
+    cannot be parsed as a more specific kind. Failures are recorded in
+    `diagnostics` if given, otherwise they are logged.
+    """
     try:
         assert json['primary']['type'] == 'job'
 
@@ -91,10 +99,28 @@ def parse_jn_activity(json: dict[str, Any]) -> JnActivity:
             case _:
                 return JnActivity.from_json(json)
     except Exception as e:
-        logger.warning(f"Unable to parse JobNimbus activity, falling back to generic JobNimbus activity item: {e}")
+        if diagnostics is None:
+            logger.warning(f"Unable to parse JobNimbus activity, falling back to generic JobNimbus activity item: {e}")
+        else:
+            diagnostics.record(
+                f"unparsable {json.get('record_type_name')!r} activity",
+                lambda: f"activity {json.get('jnid')}: {e!r}",
+            )
         return JnActivity.from_json(json)
 
-def construct_job_status_history(activities: list[JnActivity], current_status: JobStatus) -> list[(datetime, JobStatus)]:
+@metrics.timed("parse_jn_activity")
+def parse_all_jn_activities(jsons: list[dict[str, Any]]) -> tuple[list[JnActivity], Diagnostics]:
+    diagnostics = Diagnostics()
+    activities = [parse_jn_activity(json, diagnostics) for json in jsons]
+    diagnostics.log_summary("Problems parsing JobNimbus activities")
+    return activities, diagnostics
+
+def construct_job_status_history(activities: list[JnActivity], current_status: JobStatus, diagnostics: Optional[Diagnostics] = None) -> list[(datetime, JobStatus)]:
+    """
+    Construct the status history of a job from its activities.
+    Inconsistencies are recorded in `diagnostics` if given, otherwise they are
+    logged.
+    """
     history = []
     for activity in sorted(activities, key=lambda x: x.timestamp):
         if isinstance(activity, JnActivityJobCreated):
@@ -105,7 +131,12 @@ def construct_job_status_history(activities: list[JnActivity], current_status: J
                 if history[-1][1] is None:
                     history[-1] = (history[-1][0], activity.old_status)
                 elif history[-1][1] != activity.old_status:
-                    logger.warning(f"Job status history inconsistency detected: at {activity.timestamp}, the old status was {activity.old_status}, but the previous entry in the history was {history[-1][1]}")
+                    previous_status = history[-1][1]
+                    describe = lambda: f"job {activity.primary_jnid} at {activity.timestamp}: the old status was {activity.old_status}, but the previous entry in the history was {previous_status}"
+                    if diagnostics is None:
+                        logger.warning(f"Job status history inconsistency detected: {describe()}")
+                    else:
+                        diagnostics.record("old status does not match history", describe)
             history.append((activity.timestamp, activity.new_status))
 
     # if the latest status cannot be inferred from the status changes, add a final status
@@ -113,6 +144,25 @@ def construct_job_status_history(activities: list[JnActivity], current_status: J
         if history[-1][1] is None:
             history[-1] = (history[-1][0], current_status)
         if history[-1][1] != current_status:
-            logger.warning(f"Job status history inconsistency detected: at {history[-1][0]}, the status was {history[-1][1]}, but the current status is {current_status}")
+            describe = lambda: f"job {activities[0].primary_jnid} at {history[-1][0]}: the status was {history[-1][1]}, but the current status is {current_status}"
+            if diagnostics is None:
+                logger.warning(f"Job status history inconsistency detected: {describe()}")
+            else:
+                diagnostics.record("final status does not match current status", describe)
 
     return history
+
+@metrics.timed("construct_job_status_history")
+def construct_all_job_status_histories(activities: list[JnActivity], base_data: dict[str, JobParsedBaseData]) -> tuple[dict[str, list[(datetime, JobStatus)]], Diagnostics]:
+    """Construct the status history of every job in `base_data` that has
+    activities, along with the inconsistencies found."""
+    diagnostics = Diagnostics()
+    activities_by_job = defaultdict(list)
+    for activity in activities:
+        activities_by_job[activity.primary_jnid].append(activity)
+    histories = {
+        job_jnid: construct_job_status_history(job_activities, base_data[job_jnid].status, diagnostics)
+        for job_jnid, job_activities in activities_by_job.items() if job_jnid in base_data
+    }
+    diagnostics.log_summary("Job status history inconsistencies")
+    return histories, diagnostics
@@ -0,0 +1,131 @@
+from .activities import JnActivity, JnActivityJobCreated, JnActivityStatusChanged, JnActivityJobModified
+from .base_data import JobStatus, JobParsedBaseData
+from .diagnostics import Diagnostics
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+import metrics
+
+# codes of the record types stored in `ActivityColumns.record_types`
+RECORD_TYPE_OTHER = 0
+RECORD_TYPE_JOB_CREATED = 1
+RECORD_TYPE_STATUS_CHANGED = 2
+RECORD_TYPE_JOB_MODIFIED = 3
+
+# stored in the status columns when the activity is not a status change
+NO_STATUS = -1
+
+@dataclass
+class ActivityColumns:
+    """
+    Job activities stored column-wise in fixed-width arrays, one row per
+    activity, so that they can be memory-mapped from disk and shared between
+    processes without building a Python object per activity. The text and
+    field updates of activities are not stored.
+    """
+    # the jnids of the jobs, indexed by `jnid_indices`
+    jnids: list[str]
+    jnid_indices: np.ndarray # int32
+    timestamps: np.ndarray # int64, seconds since the epoch
+    record_types: np.ndarray # int8, one of the RECORD_TYPE_* codes
+    old_status_ids: np.ndarray # int32, NO_STATUS if not a status change
+    new_status_ids: np.ndarray # int32, NO_STATUS if not a status change
+
+    def __len__(self) -> int:
+        return len(self.jnid_indices)
+
+    @classmethod
+    def from_activities(cls, activities: list[JnActivity]) -> 'ActivityColumns':
+        jnids = []
+        jnid_to_index = {}
+        n = len(activities)
+        jnid_indices = np.empty(n, dtype=np.int32)
+        timestamps = np.empty(n, dtype=np.int64)
+        record_types = np.full(n, RECORD_TYPE_OTHER, dtype=np.int8)
+        old_status_ids = np.full(n, NO_STATUS, dtype=np.int32)
+        new_status_ids = np.full(n, NO_STATUS, dtype=np.int32)
+        for i, activity in enumerate(activities):
+            if (jnid_index := jnid_to_index.get(activity.primary_jnid)) is None:
+                jnid_index = jnid_to_index[activity.primary_jnid] = len(jnids)
+                jnids.append(activity.primary_jnid)
+            jnid_indices[i] = jnid_index
+            timestamps[i] = round(activity.timestamp.timestamp())
+            if isinstance(activity, JnActivityJobCreated):
+                record_types[i] = RECORD_TYPE_JOB_CREATED
+            elif isinstance(activity, JnActivityStatusChanged):
+                record_types[i] = RECORD_TYPE_STATUS_CHANGED
+                old_status_ids[i] = activity.old_status.id
+                new_status_ids[i] = activity.new_status.id
+            elif isinstance(activity, JnActivityJobModified):
+                record_types[i] = RECORD_TYPE_JOB_MODIFIED
+        return cls(jnids, jnid_indices, timestamps, record_types, old_status_ids, new_status_ids)
+
+@metrics.timed("construct_job_status_history")
+def construct_all_job_status_histories_from_columns(
+    columns: ActivityColumns,
+    base_data: dict[str, JobParsedBaseData],
+    statuses: dict[int, JobStatus],
+) -> tuple[dict[str, list[(datetime, JobStatus)]], Diagnostics]:
+    """
+    The same as `construct_all_job_status_histories`, but reading the
+    activities from columns. The rows that matter are selected and sorted by
+    job and then time with numpy, so that only job created and status changed
+    activities are ever looked at in Python.
+    """
+    diagnostics = Diagnostics()
+    rows = np.flatnonzero(
+        (columns.record_types == RECORD_TYPE_JOB_CREATED)
+        | (columns.record_types == RECORD_TYPE_STATUS_CHANGED)
+    )
+    # sort by job, then by time; the sort is stable, so activities at the
+    # same time stay in their original order like in `sorted`
+    rows = rows[np.lexsort((columns.timestamps[rows], columns.jnid_indices[rows]))]
+    jnid_indices = columns.jnid_indices[rows]
+    timestamps = columns.timestamps[rows].tolist()
+    record_types = columns.record_types[rows].tolist()
+    old_status_ids = columns.old_status_ids[rows].tolist()
+    new_status_ids = columns.new_status_ids[rows].tolist()
+    job_starts = [0, *(np.flatnonzero(np.diff(jnid_indices)) + 1).tolist(), len(rows)]
+
+    histories = {}
+    for start, end in zip(job_starts[:-1], job_starts[1:]):
+        jnid = columns.jnids[jnid_indices[start]]
+        if (job := base_data.get(jnid)) is None:
+            continue
+        current_status = job.status
+        history = []
+        for i in range(start, end):
+            timestamp = datetime.fromtimestamp(timestamps[i])
+            if record_types[i] == RECORD_TYPE_JOB_CREATED:
+                history.append((timestamp, None))
+                continue
+            old_status = statuses.get(old_status_ids[i])
+            new_status = statuses.get(new_status_ids[i])
+            if old_status is None or new_status is None:
+                diagnostics.record("unknown status id", lambda: f"job {jnid} at {timestamp}: status ids {old_status_ids[i]} -> {new_status_ids[i]}")
+                continue
+            # check the old status to make sure it is consistent
+            if len(history) > 0:
+                if history[-1][1] is None:
+                    history[-1] = (history[-1][0], old_status)
+                elif history[-1][1] != old_status:
+                    previous_status = history[-1][1]
+                    diagnostics.record("old status does not match history", lambda: f"job {jnid} at {timestamp}: the old status was {old_status}, but the previous entry in the history was {previous_status}")
+            history.append((timestamp, new_status))
+
+        # if the latest status cannot be inferred from the status changes, add a final status
+        if len(history) > 0:
+            if history[-1][1] is None:
+                history[-1] = (history[-1][0], current_status)
+            if history[-1][1] != current_status:
+                diagnostics.record("final status does not match current status", lambda: f"job {jnid} at {history[-1][0]}: the status was {history[-1][1]}, but the current status is {current_status}")
+        histories[jnid] = history
+
+    # jobs with only other kinds of activities still get an (empty) history,
+    # like in `construct_all_job_status_histories`
+    for jnid in columns.jnids:
+        if jnid not in histories and jnid in base_data:
+            histories[jnid] = []
+
+    diagnostics.log_summary("Job status history inconsistencies")
+    return histories, diagnostics
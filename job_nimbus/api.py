@@ -1,24 +1,44 @@
+from .activities import JnActivity, parse_jn_activity
 from .base_data import JobStatus, JobLeadSource, parse_job_base_data, JobParsedBaseData
+from .diagnostics import Diagnostics
 from .json_keys import KEY_JNID
+from .json_stream import iter_json_array_items
+from .response_cache import MODE_RECORD, MODE_REPLAY, ResponseCache, ResponseCacheMiss, make_cached_response, response_cache_from_env
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterable, Iterator, Optional
 import requests
 import json
 import logging
+import os
 import re
+import threading
+import time
+import metrics
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+DEFAULT_BASE_URL = "https://app.jobnimbus.com/api1"
+
 # Global session object for JobNimbus API requests
 _session = None
-
-def initialize_session(api_key: str):
-    """Initialize the global session with the API key."""
+# The URL that API paths are relative to; can be pointed at a local stand-in
+# server with the JOBNIMBUS_BASE_URL environment variable
+_base_url = os.environ.get("JOBNIMBUS_BASE_URL", DEFAULT_BASE_URL).rstrip('/')
+# Opt-in cache of GET responses on disk; see response_cache.py
+_response_cache = response_cache_from_env()
+
+def initialize_session(api_key: str, base_url: str = None):
+    """Initialize the global session with the API key, and optionally change
+    the base URL of the API."""
     logger.info(f"Initializing session with API key: {api_key}")
 
-    global _session
+    global _session, _base_url
+    if base_url is not None:
+        _base_url = base_url.rstrip('/')
+        logger.info(f"Using JobNimbus API at {_base_url}")
     _session = requests.Session()
     _session.headers.update({
         'Authorization': f'Bearer {api_key}',
@@ -31,7 +51,51 @@ def get_session() -> requests.Session:
         raise RuntimeError("Session not initialized. Call initialize_session() first.")
     return _session
 
+def get_endpoint(path: str) -> str:
+    return f"{_base_url}/{path}"
+
+def set_response_cache(response_cache: ResponseCache):
+    global _response_cache
+    logger.info(f"Using response cache in {response_cache.cache_dir} in {response_cache.mode} mode")
+    _response_cache = response_cache
+
+def get_response_cache() -> ResponseCache:
+    return _response_cache
+
+def _send(method: str, path: str, **kwargs) -> requests.Response:
+    """Send a request to the API, recording its latency, size and outcome in
+    the metrics. GET requests go through the response cache when it is
+    enabled. With `stream=True`, the latency only covers the headers, and the
+    caller counts the bytes it reads and stores them in the response cache."""
+    endpoint = get_endpoint(path)
+    cache_key = None
+    if method == "GET" and _response_cache.enabled:
+        cache_key = _response_cache.key(method, endpoint, kwargs.get("params"))
+        if (body := _response_cache.get(cache_key)) is not None:
+            return make_cached_response(endpoint, body)
+        if _response_cache.mode == MODE_REPLAY:
+            raise ResponseCacheMiss(f"GET {path} with {kwargs.get('params')} is not in the response cache")
+
+    # keep the number of distinct metrics small by leaving out jnids
+    metric_path = re.sub(r'^jobs/[^/]+', 'jobs/<jnid>', path)
+    start = time.perf_counter()
+    try:
+        response = get_session().request(method, endpoint, **kwargs)
+    except requests.RequestException:
+        metrics.increment(f"jobnimbus.{method} {metric_path}.connection_errors")
+        raise
+    finally:
+        metrics.observe(f"jobnimbus.{method} {metric_path}", time.perf_counter() - start)
+    if not kwargs.get("stream"):
+        metrics.increment("jobnimbus.bytes_received", len(response.content))
+    if not response.ok:
+        metrics.increment(f"jobnimbus.{method} {metric_path}.status_{response.status_code}")
+    elif cache_key is not None and not kwargs.get("stream"):
+        _response_cache.put(cache_key, response.content)
+    return response
+
 MAX_PER_REQUEST = 7000
+STREAM_CHUNK_SIZE = 64 * 1024
 
 def request_all_from_job_nimbus(path: str, results_key: str, filter_str: str = None, fields: list[str] = None) -> list[Any]:
     """
@@ -40,8 +104,6 @@ def request_all_from_job_nimbus(path: str, results_key: str, filter_str: str = N
     with size 0 to find the number of results, and then make a request for
     all results at once.
     """
-    session = get_session()
-    endpoint = f"https://app.jobnimbus.com/api1/{path}"
     params = {'size': str(0)}
     if filter_str:
         params['filter'] = filter_str
@@ -66,7 +128,7 @@ def request_all_from_job_nimbus(path: str, results_key: str, filter_str: str = N
     # params['size'] = str(min(MAX_PER_REQUEST, total_num_results))
     params['size'] = str(MAX_PER_REQUEST)
 
-    response = session.get(endpoint, params=params)
+    response = _send("GET", path, params=params)
     response.raise_for_status()
     data = response.json()
     if not isinstance(data, dict):
@@ -82,6 +144,37 @@ def request_all_from_job_nimbus(path: str, results_key: str, filter_str: str = N
 
     # return results
 
+def stream_all_from_job_nimbus(path: str, results_key: str, filter_str: str = None, fields: list[str] = None) -> Iterator[Any]:
+    """
+    Like `request_all_from_job_nimbus`, but read the response in chunks and
+    yield the results one at a time as soon as each has been read, so that
+    neither the whole body nor all of the decoded results are held in memory.
+    """
+    params = {'size': str(MAX_PER_REQUEST)}
+    if filter_str:
+        params['filter'] = filter_str
+    if fields:
+        params['fields'] = ','.join(fields)
+
+    response = _send("GET", path, params=params, stream=True)
+    with response:
+        response.raise_for_status()
+        # responses from the response cache have no connection behind them
+        from_network = response.raw is not None
+        def chunks():
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                if from_network:
+                    metrics.increment("jobnimbus.bytes_received", len(chunk))
+                yield chunk
+        body = chunks()
+        if from_network and _response_cache.mode == MODE_RECORD:
+            body = _response_cache.put_chunks(_response_cache.key("GET", get_endpoint(path), params), body)
+        yield from iter_json_array_items(body, results_key)
+        # read to the end of the body, which the JSON stops short of, so that
+        # all of it is recorded
+        for _ in body:
+            pass
+
 def request_from_job_nimbus(path: str) -> Any:
     """
     Make a request to the JobNimbus API and return the JSON data.
@@ -95,11 +188,8 @@ def request_from_job_nimbus(path: str) -> Any:
     Raises:
         requests.RequestException: If the API request fails
     """
-    session = get_session()
-    endpoint = f"https://app.jobnimbus.com/api1/{path}"
-
     try:
-        response = session.get(endpoint)
+        response = _send("GET", path)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -107,8 +197,18 @@ def request_from_job_nimbus(path: str) -> Any:
         raise e
 
 def request_all_job_base_data(status_registry: dict[int, JobStatus], filter_str: str = None) -> dict[str, JobParsedBaseData]:
-    jobs_json = request_all_from_job_nimbus("jobs", "results", filter_str)
-    return {job_json[KEY_JNID]: parse_job_base_data(job_json, status_registry) for job_json in jobs_json}
+    # parse each job as soon as it has been read, so that the raw JSON of all
+    # of the jobs is never held at once
+    jobs = {}
+    parse_seconds = 0
+    with metrics.span("stream_job_base_data"):
+        for job_json in stream_all_from_job_nimbus("jobs", "results", filter_str):
+            start = time.perf_counter()
+            jobs[job_json[KEY_JNID]] = parse_job_base_data(job_json, status_registry)
+            parse_seconds += time.perf_counter() - start
+    # the parsing on its own, without the download it is interleaved with
+    metrics.observe("parse_job_base_data", parse_seconds)
+    return jobs
 
 def request_all_job_jnids(filter_str: str = None) -> list[str]:
     results = request_all_from_job_nimbus("jobs", "results", filter_str, [KEY_JNID])
@@ -137,21 +237,33 @@ def request_job_activity_for_job(job_jnid: str) -> list[dict[str, Any]]:
     })
     return request_all_from_job_nimbus(f"activities", "activity", filter_str)
 
-def request_all_job_activity() -> list[dict[str, Any]]:
-    filter_str = json.dumps({
-        "must": [
-            {
-                "term": {
-                    "is_status_change": True,
-                },
+def _job_activity_filter(earliest_ts: Optional[int] = None) -> str:
+    """The filter for status change activities of jobs, optionally only those
+    created at or before `earliest_ts`."""
+    must = [
+        {
+            "term": {
+                "is_status_change": True,
             },
-            {
-                "term": {
-                    "primary.type": "job"
+        },
+        {
+            "term": {
+                "primary.type": "job"
+            }
+        },
+    ]
+    if earliest_ts is not None:
+        must.append({
+            "range": {
+                "date_created": {
+                    "lte": earliest_ts,
                 }
             }
-        ]
-    })
+        })
+    return json.dumps({"must": must})
+
+def request_all_job_activity() -> list[dict[str, Any]]:
+    filter_str = _job_activity_filter()
 
     earliest_ts = None
     activities = []
@@ -164,31 +276,45 @@ def request_all_job_activity() -> list[dict[str, Any]]:
         earliest_ts = activities[-1]['date_created']
         logger.debug(f"Earliest timestamp: {datetime.fromtimestamp(earliest_ts)}")
 
-        filter_str = json.dumps({
-            "must": [
-                {
-                    "term": {
-                        "is_status_change": True,
-                    },
-                },
-                {
-                    "term": {
-                        "primary.type": "job"
-                    }
-                },
-                {
-                    "range": {
-                        "date_created": {
-                            "lte": earliest_ts,
-                        }
-                    }
-                },
-            ]
-        })
+        filter_str = _job_activity_filter(earliest_ts)
 
     deduped = list({a["jnid"]: a for a in activities}.values())
     return deduped
 
+@metrics.timed("stream_jn_activity")
+def request_all_parsed_job_activity() -> tuple[list[JnActivity], Diagnostics]:
+    """
+    The same as `parse_all_jn_activities(request_all_job_activity())`, but
+    each activity is parsed as soon as it has been read from the response, so
+    that the raw JSON of all of the activities is never held at once.
+    """
+    diagnostics = Diagnostics()
+    filter_str = _job_activity_filter()
+    # the pages overlap at their boundaries, so the activities are deduplicated
+    # by jnid
+    activities: dict[str, JnActivity] = {}
+    parse_seconds = 0
+    while True:
+        num_new_activities = 0
+        earliest_ts = None
+        for activity_json in stream_all_from_job_nimbus(f"activities", "activity", filter_str):
+            num_new_activities += 1
+            earliest_ts = activity_json['date_created']
+            if activity_json["jnid"] not in activities:
+                start = time.perf_counter()
+                activities[activity_json["jnid"]] = parse_jn_activity(activity_json, diagnostics)
+                parse_seconds += time.perf_counter() - start
+        logger.debug(f"Retrieved {num_new_activities} activities")
+        if num_new_activities < MAX_PER_REQUEST:
+            break
+        logger.debug(f"Earliest timestamp: {datetime.fromtimestamp(earliest_ts)}")
+        filter_str = _job_activity_filter(earliest_ts)
+
+    # the parsing on its own, without the download it is interleaved with
+    metrics.observe("parse_jn_activity", parse_seconds)
+    diagnostics.log_summary("Problems parsing JobNimbus activities")
+    return list(activities.values()), diagnostics
+
 def request_job_statuses() -> dict[int, JobStatus]:
     logger.info("Requesting job statuses...")
     # get the settings object
@@ -218,8 +344,7 @@ def request_lead_sources() -> dict[int, JobLeadSource]:
     return sources
 
 def request_put(path: str, json: dict[str, Any]) -> Any:
-    session = get_session()
-    endpoint = f"https://app.jobnimbus.com/api1/{path}"
+    endpoint = get_endpoint(path)
 
     # confirmation = input(f"Proceed with PUT {endpoint} with json {json}? (Y/N): ")
     # if confirmation.strip().upper() != "Y":
@@ -227,13 +352,138 @@ def request_put(path: str, json: dict[str, Any]) -> Any:
     #     return None
 
     try:
-        print(f"PUT {endpoint} with json {json}")
-        response = session.put(endpoint, json=json)
+        logger.debug(f"PUT {endpoint} with json {json}")
+        response = _send("PUT", path, json=json)
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
-        raise requests.RequestException(f"API request failed: {e}")
+        raise requests.RequestException(f"API request failed: {e}", response=e.response) from e
 
 def request_update_job_base_data(job_jnid: str, json: dict[str, Any]):
     request_put(f"jobs/{job_jnid}", json)
 
+class TokenBucket:
+    """A thread-safe token bucket that allows `rate` acquisitions per second
+    on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        if rate <= 0:
+            raise ValueError(f"The rate must be positive, got {rate}")
+        if capacity < 1:
+            raise ValueError(f"The capacity must be at least 1, got {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+@dataclass
+class JobUpdateResult:
+    jnid: str
+    # one of "updated", "skipped" (the patch changes nothing), "dry_run" or
+    # "failed"
+    outcome: str
+    # the part of the patch that actually changes the job
+    patch: dict[str, Any]
+    attempts: int = 0
+    error: Optional[str] = None
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def diff_job_patch(raw_base_data: Optional[dict[str, Any]], patch: dict[str, Any]) -> dict[str, Any]:
+    """The fields of `patch` whose values differ from the job's raw base data."""
+    if raw_base_data is None:
+        return dict(patch)
+    return {key: value for key, value in patch.items() if raw_base_data.get(key) != value}
+
+def request_bulk_update_job_base_data(
+    patches: Iterable[tuple[str, dict[str, Any]]],
+    raw_base_data: Optional[dict[str, dict[str, Any]]] = None,
+    dry_run: bool = False,
+    max_workers: int = 4,
+    requests_per_second: float = 5,
+    max_attempts: int = 4,
+    backoff_seconds: float = 1,
+) -> list[JobUpdateResult]:
+    """
+    Update the base data of many jobs.
+
+    Patches that would not change anything according to `raw_base_data` (the
+    raw JSON of the jobs keyed by jnid) are skipped. If it isn't given, only
+    the patched fields of the patched jobs are kept from a streamed download
+    of the jobs. The rest are sent by a pool of `max_workers` threads, at no
+    more than `requests_per_second`, retrying rate limits, server errors and
+    connection errors up to `max_attempts` times with exponential backoff. In
+    dry run mode, everything is done except sending the requests.
+
+    Returns: The result of each patch, in the order they were given.
+
+    Raises: ValueError if `requests_per_second` isn't positive.
+    """
+    bucket = TokenBucket(requests_per_second, capacity=max(1, max_workers))
+    patches = list(patches)
+    if raw_base_data is None:
+        logger.info("Requesting raw job base data to diff patches against")
+        patched_jnids = {jnid for jnid, _ in patches}
+        patched_fields = sorted({key for _, patch in patches for key in patch} - {KEY_JNID})
+        raw_base_data = {
+            job_json[KEY_JNID]: job_json
+            for job_json in stream_all_from_job_nimbus("jobs", "results", fields=[KEY_JNID, *patched_fields])
+            if job_json[KEY_JNID] in patched_jnids
+        }
+
+    results = []
+    to_send = []
+    for jnid, patch in patches:
+        effective_patch = diff_job_patch(raw_base_data.get(jnid), patch)
+        result = JobUpdateResult(jnid, "skipped", effective_patch)
+        results.append(result)
+        if not effective_patch:
+            continue
+        if dry_run:
+            result.outcome = "dry_run"
+            continue
+        to_send.append(result)
+    logger.info(f"Bulk update: {len(to_send)} to send, {len(results) - len(to_send)} skipped or dry run")
+
+    def send(result: JobUpdateResult):
+        while True:
+            result.attempts += 1
+            bucket.acquire()
+            try:
+                # the response body isn't used, so it isn't decoded, and an
+                # update that went through can't look like one to retry
+                _send("PUT", f"jobs/{result.jnid}", json=result.patch).raise_for_status()
+                result.outcome = "updated"
+                result.error = None
+                return
+            except requests.RequestException as e:
+                response = getattr(e, 'response', None)
+                retryable = response is None or response.status_code in RETRYABLE_STATUS_CODES
+                result.outcome = "failed"
+                result.error = str(e)
+                if not retryable or result.attempts >= max_attempts:
+                    logger.warning(f"Failed to update job {result.jnid} after {result.attempts} attempts: {e}")
+                    return
+                metrics.increment("jobnimbus.retries")
+                time.sleep(backoff_seconds * 2 ** (result.attempts - 1))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(send, to_send))
+
+    num_failed = sum(1 for r in results if r.outcome == "failed")
+    logger.info(f"Bulk update finished: {len(to_send) - num_failed} updated, {num_failed} failed")
+    return results
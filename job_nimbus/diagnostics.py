@@ -0,0 +1,63 @@
+from collections import Counter
+from typing import Callable
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# if set, every recorded problem is also logged as it happens; set
+# AHITOOL_VERBOSE=1 to turn it on in every entry point (the Dash app, the WSGI
+# server and the command line tool)
+verbose = os.environ.get("AHITOOL_VERBOSE", "") not in ("", "0")
+
+def set_verbose(value: bool):
+    global verbose
+    verbose = value
+
+class Diagnostics:
+    """
+    Counts the problems found while processing many records, keeping only the
+    first few descriptions of each kind of problem as samples.
+    """
+
+    def __init__(self, max_samples: int = 10):
+        self.max_samples = max_samples
+        self.counts: Counter[str] = Counter()
+        self.samples: dict[str, list[str]] = {}
+
+    def record(self, kind: str, describe: Callable[[], str]):
+        """
+        Record a problem of the given kind. `describe` is only called if the
+        description is needed, so that it costs nothing to record a problem
+        whose kind already has enough samples.
+        """
+        self.counts[kind] += 1
+        samples = self.samples.setdefault(kind, [])
+        if verbose:
+            description = describe()
+            logger.warning(f"{kind}: {description}")
+            if len(samples) < self.max_samples:
+                samples.append(description)
+        elif len(samples) < self.max_samples:
+            samples.append(describe())
+
+    def merge(self, other: 'Diagnostics'):
+        for kind, count in other.counts.items():
+            self.counts[kind] += count
+            samples = self.samples.setdefault(kind, [])
+            samples.extend(other.samples.get(kind, [])[:self.max_samples - len(samples)])
+
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def summary(self) -> list[dict[str, object]]:
+        """One row per kind of problem, most common first."""
+        return [
+            {"kind": kind, "count": count, "samples": self.samples.get(kind, [])}
+            for kind, count in self.counts.most_common()
+        ]
+
+    def log_summary(self, prefix: str):
+        if self.counts:
+            logger.warning(f"{prefix}: {', '.join(f'{count} {kind}' for kind, count in self.counts.most_common())}")
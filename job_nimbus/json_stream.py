@@ -0,0 +1,114 @@
+"""
+This module decodes the items of an array in a JSON object one at a time
+while the response body is still being read, so that a large response never
+has to be held in memory in full, neither as bytes nor as decoded objects.
+"""
+
+from typing import Any, Iterable, Iterator
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# characters that can continue a number, e.g. "12" + ".5e3"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+class _Buffer:
+    """Text decoded from a stream of byte chunks, consumed from the front."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ""
+        self.pos = 0
+        self.finished = False
+
+    def read_more(self) -> bool:
+        """Append the next chunk to the text. Returns False at the end of the
+        stream."""
+        if self.finished:
+            return False
+        # drop the text that has been consumed, so the buffer stays about the
+        # size of a chunk
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.text += self._utf8.decode(b"", final=True)
+            self.finished = True
+            return False
+        self.text += self._utf8.decode(chunk)
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or "" at the end of
+        the stream."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.read_more():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON: expected {char!r} but found {self.peek()!r}")
+        self.pos += 1
+
+    def decode_value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # a number at the end of the buffer may continue in the next
+                # chunk
+                if self.finished or (end < len(self.text) and self.text[end] not in _NUMBER_CHARS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.finished:
+                    raise
+            self.read_more()
+
+def iter_json_array_items(chunks: Iterable[bytes], array_key: str) -> Iterator[Any]:
+    """
+    Yield the items of the array under `array_key` in a JSON object that is
+    read from `chunks`, decoding each item as soon as all of it has been read.
+    The other values of the object are decoded and discarded.
+
+    Raises: ValueError if the JSON is invalid or has no array under the key.
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect("{")
+    found = False
+    if buffer.peek() == "}":
+        buffer.pos += 1
+    else:
+        while True:
+            key = buffer.decode_value()
+            buffer.expect(":")
+            if key == array_key and buffer.peek() == "[":
+                found = True
+                buffer.pos += 1
+                if buffer.peek() == "]":
+                    buffer.pos += 1
+                else:
+                    while True:
+                        yield buffer.decode_value()
+                        if buffer.peek() == ",":
+                            buffer.pos += 1
+                        else:
+                            buffer.expect("]")
+                            break
+            else:
+                buffer.decode_value()
+            if buffer.peek() == ",":
+                buffer.pos += 1
+            else:
+                buffer.expect("}")
+                break
+    if not found:
+        raise ValueError(f"Invalid response format: missing '{array_key}' field")
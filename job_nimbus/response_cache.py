@@ -0,0 +1,155 @@
+"""
+An opt-in cache of JobNimbus API responses on disk, so that development runs,
+tests and benchmarks can sync without downloading everything again, or
+without network access at all.
+
+The cache has three modes:
+- passthrough: the cache is not used (the default)
+- record: responses are served from the cache when they are in it, and
+  fetched and stored when they are not
+- replay: responses are only served from the cache; a request that is not in
+  it fails instead of going to the network
+
+Responses are keyed by method, endpoint and query parameters (which hold the
+filter and the field set), and their bodies are stored gzip-compressed. When
+the cache grows past its size cap, the least recently used responses are
+evicted.
+"""
+
+from typing import Any, Iterable, Iterator, Optional
+import gzip
+import hashlib
+import json
+import logging
+import os
+import requests
+import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MODE_PASSTHROUGH = "passthrough"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+MODES = (MODE_PASSTHROUGH, MODE_RECORD, MODE_REPLAY)
+
+DEFAULT_CACHE_DIR = "jn_response_cache"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+class ResponseCacheMiss(requests.RequestException):
+    """Raised in replay mode for a request that is not in the cache."""
+    pass
+
+class ResponseCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, mode: str = MODE_PASSTHROUGH, max_bytes: int = DEFAULT_MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"Unknown response cache mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != MODE_PASSTHROUGH
+
+    def key(self, method: str, path: str, params: Optional[dict[str, Any]] = None) -> str:
+        normalized = json.dumps([method.upper(), path, sorted((params or {}).items())])
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached body for the key, or None if it isn't cached."""
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rb') as f:
+                body = f.read()
+        except (FileNotFoundError, EOFError, gzip.BadGzipFile):
+            metrics.increment("jobnimbus.response_cache.misses")
+            return None
+        # the modification time is the last use, for LRU eviction
+        os.utime(path)
+        metrics.increment("jobnimbus.response_cache.hits")
+        return body
+
+    def put(self, key: str, body: bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        with gzip.open(f"{path}.tmp", 'wb') as f:
+            f.write(body)
+        os.replace(f"{path}.tmp", path)
+        self.evict()
+
+    def put_chunks(self, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Yield the chunks of a body that is being streamed, writing them to
+        the cache as they go by. The body is only stored once all of it has
+        been read."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        complete = False
+        try:
+            with gzip.open(f"{path}.tmp", 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                os.replace(f"{path}.tmp", path)
+                self.evict()
+            else:
+                os.remove(f"{path}.tmp")
+
+    def evict(self):
+        """Remove the least recently used responses until the cache is under
+        its size cap."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json.gz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            metrics.increment("jobnimbus.response_cache.evictions")
+            logger.info(f"Evicted {name} from the response cache")
+
+    def clear(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json.gz"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+def make_cached_response(url: str, body: bytes) -> requests.Response:
+    """Build a response object for a cached body, so that callers can't tell
+    it apart from a response from the network."""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers["Content-Type"] = "application/json"
+    response._content = body
+    response._content_consumed = True
+    response.encoding = "utf-8"
+    return response
+
+def response_cache_from_env() -> ResponseCache:
+    """Configure the cache with the JOBNIMBUS_CACHE_MODE, JOBNIMBUS_CACHE_DIR
+    and JOBNIMBUS_CACHE_MAX_MB environment variables."""
+    max_mb = os.environ.get("JOBNIMBUS_CACHE_MAX_MB")
+    return ResponseCache(
+        cache_dir=os.environ.get("JOBNIMBUS_CACHE_DIR", DEFAULT_CACHE_DIR),
+        mode=os.environ.get("JOBNIMBUS_CACHE_MODE", MODE_PASSTHROUGH),
+        max_bytes=int(max_mb) * 1024 * 1024 if max_mb else DEFAULT_MAX_BYTES,
+    )
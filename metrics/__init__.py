@@ -0,0 +1,9 @@
+from .registry import (
+    span,
+    timed,
+    observe,
+    increment,
+    snapshot,
+    reset,
+    to_prometheus,
+)
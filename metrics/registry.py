@@ -0,0 +1,107 @@
+"""
+This module collects performance metrics in process: timing spans (how many
+times a piece of code ran and how long it took) and counters. Recording a
+metric only takes a lock and a dictionary update, so it is cheap enough to
+leave on everywhere.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Iterator
+import threading
+import time
+
+@dataclass
+class SpanStats:
+    count: int = 0
+    total_seconds: float = 0
+    max_seconds: float = 0
+    last_seconds: float = 0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_seconds = seconds
+
+_lock = threading.Lock()
+_spans: dict[str, SpanStats] = {}
+_counters: dict[str, float] = {}
+
+def observe(name: str, seconds: float):
+    """Record that the span `name` took `seconds`."""
+    with _lock:
+        if (stats := _spans.get(name)) is None:
+            stats = _spans[name] = SpanStats()
+        stats.add(seconds)
+
+def increment(name: str, amount: float = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the body of the `with` statement as the span `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+def timed(name: str) -> Callable:
+    """Decorator that times every call of the function as the span `name`."""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def snapshot() -> dict[str, Any]:
+    """All metrics collected so far, as JSON-serializable data."""
+    with _lock:
+        return {
+            "spans": {
+                name: {
+                    "count": stats.count,
+                    "total_seconds": stats.total_seconds,
+                    "avg_seconds": stats.total_seconds / stats.count,
+                    "max_seconds": stats.max_seconds,
+                    "last_seconds": stats.last_seconds,
+                }
+                for name, stats in sorted(_spans.items())
+            },
+            "counters": dict(sorted(_counters.items())),
+        }
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus(prefix: str = "ahitool") -> str:
+    """All metrics collected so far, in the Prometheus text exposition
+    format."""
+    data = snapshot()
+    lines = [
+        f"# TYPE {prefix}_span_seconds summary",
+    ]
+    for name, stats in data["spans"].items():
+        label = f'{{span="{_escape_label(name)}"}}'
+        lines.append(f"{prefix}_span_seconds_sum{label} {stats['total_seconds']}")
+        lines.append(f"{prefix}_span_seconds_count{label} {stats['count']}")
+    lines.append(f"# TYPE {prefix}_span_max_seconds gauge")
+    for name, stats in data["spans"].items():
+        lines.append(f'{prefix}_span_max_seconds{{span="{_escape_label(name)}"}} {stats["max_seconds"]}')
+    lines.append(f"# TYPE {prefix}_counter_total counter")
+    for name, value in data["counters"].items():
+        lines.append(f'{prefix}_counter_total{{counter="{_escape_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,21 @@
+# WSGI entry point for serving the Dash app in production with several worker
+# processes, e.g.
+#
+#     gunicorn --workers 4 --bind 0.0.0.0:8050 wsgi:server
+#
+# The workers share the data files: writes are locked and atomic, each worker
+# reloads the data when another worker changes it, and only one worker at a
+# time refreshes a dataset from JobNimbus.
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(process)d %(name)s - %(message)s"
+)
+
+from dash_app.app import create_app, initialize_data
+
+initialize_data()
+app = create_app()
+server = app.server